@@ -31,7 +31,7 @@ async function fetchProducts() {
   try {
     console.log("Intentando conectar con la API...");
     console.log("API_BASE:", API_BASE);
-    const url = `${API_BASE}/api/products`;
+    const url = `${API_BASE}/api/products?all=1`;
     console.log("URL completa:", url);
     const res = await fetch(url);
     
@@ -127,7 +127,7 @@ async function createProduct(product) {
 
 async function getProductStats() {
   try {
-    const res = await fetch(`${API_BASE}/api/products`);
+    const res = await fetch(`${API_BASE}/api/products?all=1`);
     if (!res.ok) throw new Error("Error al obtener productos");
     
     const products = await res.json();
@@ -21,6 +21,27 @@ const accessoriesGrid = document.getElementById("accesorios");
 const cartCountEl = document.querySelector(".cart");
 const miniCartCount = document.getElementById("mini-cart-count");
 
+// Catálogo precompilado: el manifiesto (sin caché) indica el snapshot vigente,
+// que tiene hash en el nombre y se cachea como inmutable. Si falla, la API.
+async function fetchCatalog() {
+    try {
+        const manifestResponse = await fetch(`${API_BASE}/assets/catalog/catalog-manifest.json`, { cache: 'no-cache' });
+        if (manifestResponse.ok) {
+            const manifest = await manifestResponse.json();
+            const snapshotResponse = await fetch(`${API_BASE}/assets/catalog/${manifest.file}`);
+            console.log('Snapshot del catálogo:', manifest.file, snapshotResponse.status);
+            if (snapshotResponse.ok) return await snapshotResponse.json();
+        }
+    } catch (error) {
+        console.warn('Snapshot del catálogo no disponible, usando la API:', error);
+    }
+
+    const response = await fetch(`${API_BASE}/api/products?all=1`);
+    console.log('Respuesta de la API:', response.status);
+    if (!response.ok) throw new Error("Error al cargar productos");
+    return await response.json();
+}
+
 // Función para cargar productos desde la API
 async function loadProducts() {
     console.log('=== CARGANDO PRODUCTOS ===');
@@ -31,12 +52,7 @@ async function loadProducts() {
         showLoading(productsGrid, "Cargando cascos...");
         showLoading(accessoriesGrid, "Cargando accesorios...");
         
-        const response = await fetch(`${API_BASE}/api/products`);
-        console.log('Respuesta de la API:', response.status);
-        
-        if (!response.ok) throw new Error("Error al cargar productos");
-        
-        products = await response.json();
+        products = await fetchCatalog();
         console.log('Productos cargados:', products.length);
         console.log('Detalles de productos:', products.map(p => ({ id: p.id, name: p.name, image: p.image, images: p.images })));
         renderProducts();
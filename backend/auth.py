@@ -1,9 +1,40 @@
-import bcrypt
 import secrets
+import time
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify, g
 from database import get_conn
+from password_hashing import password_hasher, is_bcrypt_hash, PasswordHashingBusy
+from session_cache import (session_cache, get_cached_session, cache_session, get_cached_profile,
+                           invalidate_session, invalidate_user_sessions)
+from session_tokens import (SIGNED_TOKENS, InvalidToken, is_signed_token, encode_token, decode_token,
+                            session_revocations)
+
+
+# Listado de usuarios del admin (filas dict; también se usa en el stream NDJSON)
+USER_LIST_SQL = """
+    SELECT id, username, role, nombre, apellido, dni, telefono,
+           direccion, codigo_postal, email, created_at, updated_at
+    FROM users ORDER BY created_at DESC
+"""
+
+
+def user_summary(u):
+    """Fila de USER_LIST_SQL -> dict para el admin"""
+    return {
+        'id': u['id'],
+        'username': u['username'],
+        'role': u['role'],
+        'nombre': u['nombre'],
+        'apellido': u['apellido'],
+        'dni': u['dni'],
+        'telefono': u['telefono'],
+        'direccion': u['direccion'],
+        'codigo_postal': u['codigo_postal'],
+        'email': u['email'],
+        'created_at': u['created_at'].isoformat() if u['created_at'] else None,
+        'updated_at': u['updated_at'].isoformat() if u['updated_at'] else None
+    }
 
 
 class AuthManager:
@@ -13,19 +44,19 @@ class AuthManager:
     # ---------------------- PASSWORDS ----------------------
 
     def hash_password(self, password):
-        """Hash de contraseña usando bcrypt con sal aleatoria"""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        """Hash de contraseña usando bcrypt con sal aleatoria (en el pool de password_hashing)"""
+        return password_hasher.hash(password)
 
     def verify_password(self, password, hashed):
         """Soporta bcrypt (nuevo) y SHA-256 (usuarios legacy)"""
-        if hashed.startswith('$2b$') or hashed.startswith('$2a$'):
-            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        if is_bcrypt_hash(hashed):
+            return password_hasher.verify(password, hashed)
         # Hash SHA-256 legacy — migración automática
         import hashlib
         return hashlib.sha256(password.encode()).hexdigest() == hashed
 
     def _migrate_password_to_bcrypt(self, user_id, password):
-        """Migrar SHA-256 a bcrypt automáticamente al hacer login exitoso"""
+        """Migrar SHA-256 (o bcrypt con costo menor al vigente) a bcrypt al hacer login exitoso"""
         try:
             new_hash = self.hash_password(password)
             with get_conn() as conn:
@@ -35,6 +66,7 @@ class AuthManager:
                     (new_hash, user_id)
                 )
                 conn.commit()
+            password_hasher.record_rehash()
         except Exception as e:
             print(f"⚠️ Error migrando hash de contraseña: {e}")
 
@@ -45,28 +77,90 @@ class AuthManager:
         return secrets.token_urlsafe(32)
 
     def create_session(self, user_id, expires_hours=24):
-        """Crear sesión de usuario"""
+        """Crear sesión de usuario (con SESSION_TOKEN_MODE=signed devuelve un token firmado)"""
         token = self.generate_token()
         expires_at = datetime.now() + timedelta(hours=expires_hours)
 
         with get_conn() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "INSERT INTO sessions (user_id, token, expires_at) VALUES (%s, %s, %s)",
+                "INSERT INTO sessions (user_id, token, expires_at) VALUES (%s, %s, %s) RETURNING id",
                 (user_id, token, expires_at)
             )
+            session_id = cursor.fetchone()['id']
+            if SIGNED_TOKENS:
+                cursor.execute("SELECT role FROM users WHERE id = %s", (user_id,))
+                role = cursor.fetchone()['role']
             conn.commit()
 
+        if SIGNED_TOKENS:
+            # Solo identidad y rol: los datos del perfil pueden cambiar mientras el token vive
+            return encode_token({
+                'sid': session_id,
+                'uid': user_id,
+                'role': role,
+                'iat': int(time.time()),
+                'exp': int(expires_at.timestamp()),
+            })
         return token
 
+    def _validate_signed_session(self, token):
+        """Token firmado: firma, vencimiento y revocación se verifican en memoria"""
+        try:
+            claims = decode_token(token)
+        except InvalidToken:
+            return None
+        if session_revocations.is_revoked(claims['sid']):
+            return None
+        # El rol viaja en el token (cambiarlo revoca las sesiones); el resto, de la caché
+        profile = get_cached_profile(claims['uid'], self._load_profile)
+        if profile is None:
+            return None
+        profile['role'] = claims['role']
+        return profile
+
+    @staticmethod
+    def _load_profile(user_id):
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, username, nombre, apellido, email FROM users WHERE id = %s",
+                (user_id,)
+            )
+            user = cursor.fetchone()
+        if not user:
+            return None
+        return {
+            'user_id': user['id'],
+            'username': user['username'],
+            'nombre': user['nombre'],
+            'apellido': user['apellido'],
+            'email': user['email']
+        }
+
+    @staticmethod
+    def _revoke_user_sessions(cursor, user_id):
+        """Borra las sesiones del usuario (los tokens firmados llevan el rol: hay que invalidarlos)"""
+        cursor.execute("DELETE FROM sessions WHERE user_id = %s RETURNING id", (user_id,))
+        return [row['id'] for row in cursor.fetchall()]
+
     def validate_session(self, token):
-        """Validar sesión y obtener usuario"""
+        """Validar sesión y obtener usuario (de la caché de sesiones si está)"""
+        if SIGNED_TOKENS and is_signed_token(token):
+            return self._validate_signed_session(token)
+
+        cached = get_cached_session(token)
+        if cached is not None:
+            return cached
+
+        # Generación antes de consultar: si se invalida durante la consulta, no se cachea
+        generation = session_cache.generation
         with get_conn() as conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM sessions WHERE expires_at < NOW()")
+            # Las sesiones vencidas se borran en segundo plano (maintenance.py)
             cursor.execute(
                 """
-                SELECT u.id, u.username, u.role, u.nombre, u.apellido, u.email
+                SELECT u.id, u.username, u.role, u.nombre, u.apellido, u.email, s.expires_at
                 FROM users u
                 JOIN sessions s ON u.id = s.user_id
                 WHERE s.token = %s AND s.expires_at > NOW()
@@ -76,8 +170,7 @@ class AuthManager:
             user = cursor.fetchone()
 
             if user:
-                conn.commit()
-                return {
+                session = {
                     'user_id': user['id'],
                     'username': user['username'],
                     'role': user['role'],
@@ -85,6 +178,8 @@ class AuthManager:
                     'apellido': user['apellido'],
                     'email': user['email']
                 }
+                cache_session(token, session, user['expires_at'].timestamp(), generation)
+                return session
 
         return None
 
@@ -137,6 +232,8 @@ class AuthManager:
                 user_id = result['id'] if isinstance(result, dict) else result[0]
                 return {"success": True, "message": "Usuario registrado correctamente", "user_id": user_id}
 
+        except PasswordHashingBusy:
+            raise
         except Exception as e:
             print(f"❌ Error en register_user: {type(e).__name__} - {str(e)}")
             return {"success": False, "error": f"Error al registrar usuario: {str(e)}"}
@@ -160,8 +257,10 @@ class AuthManager:
                 if not self.verify_password(password, user['password_hash']):
                     return None
 
-                # Migrar a bcrypt si el hash es SHA-256 legacy
-                if not (user['password_hash'].startswith('$2b$') or user['password_hash'].startswith('$2a$')):
+                # Migrar a bcrypt si el hash es SHA-256 legacy, o rehacerlo si el costo subió
+                if not is_bcrypt_hash(user['password_hash']):
+                    self._migrate_password_to_bcrypt(user['id'], password)
+                elif password_hasher.needs_rehash(user['password_hash']):
                     self._migrate_password_to_bcrypt(user['id'], password)
 
                 email_verified = user.get('email_verified', False)
@@ -182,6 +281,8 @@ class AuthManager:
                     'email_verified': True
                 }
 
+        except PasswordHashingBusy:
+            raise
         except Exception as e:
             print(f"❌ Error en authenticate_user: {type(e).__name__} - {str(e)}")
             return None
@@ -211,16 +312,31 @@ class AuthManager:
                 'user': user_data
             }
 
+        except PasswordHashingBusy:
+            raise
         except Exception as e:
             print(f"❌ Error en login: {type(e).__name__} - {str(e)}")
             return {'success': False, 'error': f'Error al hacer login: {str(e)}'}
 
     def logout_user(self, token):
         """Cerrar sesión"""
+        if is_signed_token(token):
+            try:
+                session_id = decode_token(token, verify_exp=False)['sid']
+            except InvalidToken:
+                return
+            with get_conn() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM sessions WHERE id = %s", (session_id,))
+                conn.commit()
+            session_revocations.revoke(session_id)
+            return
+
         with get_conn() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM sessions WHERE token = %s", (token,))
             conn.commit()
+        invalidate_session(token)
 
     def logout(self, token):
         """Logout de usuario"""
@@ -301,6 +417,7 @@ class AuthManager:
                         values
                     )
                     conn.commit()
+                    invalidate_user_sessions(user_id)
 
                 return {"success": True, "message": "Perfil actualizado correctamente"}
 
@@ -312,31 +429,8 @@ class AuthManager:
         try:
             with get_conn() as conn:
                 cursor = conn.cursor()
-                cursor.execute(
-                    """
-                    SELECT id, username, role, nombre, apellido, dni, telefono,
-                           direccion, codigo_postal, email, created_at, updated_at
-                    FROM users ORDER BY created_at DESC
-                    """
-                )
-                users = cursor.fetchall()
-                return [
-                    {
-                        'id': u['id'],
-                        'username': u['username'],
-                        'role': u['role'],
-                        'nombre': u['nombre'],
-                        'apellido': u['apellido'],
-                        'dni': u['dni'],
-                        'telefono': u['telefono'],
-                        'direccion': u['direccion'],
-                        'codigo_postal': u['codigo_postal'],
-                        'email': u['email'],
-                        'created_at': u['created_at'].isoformat() if u['created_at'] else None,
-                        'updated_at': u['updated_at'].isoformat() if u['updated_at'] else None
-                    }
-                    for u in users
-                ]
+                cursor.execute(USER_LIST_SQL)
+                return [user_summary(u) for u in cursor.fetchall()]
         except Exception as e:
             print(f"❌ Error en get_all_users: {str(e)}")
             return []
@@ -353,7 +447,11 @@ class AuthManager:
                     "UPDATE users SET role = %s, updated_at = NOW() WHERE id = %s",
                     (new_role, user_id)
                 )
+                revoked = self._revoke_user_sessions(cursor, user_id) if SIGNED_TOKENS else []
                 conn.commit()
+                invalidate_user_sessions(user_id)
+                for session_id in revoked:
+                    session_revocations.revoke(session_id)
                 return {"success": True, "message": "Rol actualizado correctamente"}
         except Exception as e:
             return {"success": False, "error": f"Error al actualizar rol: {str(e)}"}
@@ -366,9 +464,12 @@ class AuthManager:
                 cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
                 if not cursor.fetchone():
                     return {"success": False, "error": "Usuario no encontrado"}
-                cursor.execute("DELETE FROM sessions WHERE user_id = %s", (user_id,))
+                revoked = self._revoke_user_sessions(cursor, user_id)
                 cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
                 conn.commit()
+                invalidate_user_sessions(user_id)
+                for session_id in revoked:
+                    session_revocations.revoke(session_id)
                 return {"success": True, "message": "Usuario eliminado correctamente"}
         except Exception as e:
             return {"success": False, "error": f"Error al eliminar usuario: {str(e)}"}
@@ -412,7 +513,12 @@ class AuthManager:
                         f"UPDATE users SET {', '.join(update_fields)}, updated_at = NOW() WHERE id = %s",
                         values
                     )
+                    # Con tokens firmados un cambio de rol obliga a volver a iniciar sesión
+                    revoked = self._revoke_user_sessions(cursor, user_id) if SIGNED_TOKENS and 'role' in data else []
                     conn.commit()
+                    invalidate_user_sessions(user_id)
+                    for session_id in revoked:
+                        session_revocations.revoke(session_id)
 
                 return {"success": True, "message": "Usuario actualizado correctamente"}
 
@@ -459,6 +565,8 @@ class AuthManager:
                 conn.commit()
                 return {"success": True, "message": "Usuario creado correctamente"}
 
+        except PasswordHashingBusy:
+            raise
         except Exception as e:
             return {"success": False, "error": f"Error al crear usuario: {str(e)}"}
 
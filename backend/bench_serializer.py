@@ -0,0 +1,149 @@
+"""
+Microbenchmark de la serialización del catálogo (filas por segundo).
+
+Compara el camino anterior (row_to_dict genérico fila por fila + json de la
+librería estándar) contra el serializador compilado por forma de consulta y
+el proveedor JSON de la app (orjson si está instalado).
+No necesita base de datos: usa filas sintéticas con los tipos que devuelve
+psycopg2 (Decimal, list, dict).
+
+Uso: python bench_serializer.py [filas] [repeticiones]
+"""
+import json
+import sys
+import time
+from decimal import Decimal
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from serializers import PRODUCT_COLUMNS, compile_product_serializer
+from json_provider import FastJSONProvider, ORJSON_AVAILABLE
+
+
+def legacy_row_to_dict(row, columns=None):
+    """row_to_dict tal como estaba antes del serializador compilado (recalcula precio_efectivo)"""
+    if hasattr(row, '_asdict'):
+        d = row._asdict()
+    else:
+        d = {}
+        if columns is None:
+            columns = ['id', 'name', 'brand', 'price', 'porcentaje_descuento', 'category', 'condition', 'sizes', 'stock', 'image', 'images', 'status']
+        for i, col in enumerate(columns):
+            if i < len(row):
+                d[col] = row[i]
+    if "sizes" in d:
+        if isinstance(d["sizes"], list):
+            pass
+        elif d["sizes"] and isinstance(d["sizes"], str):
+            d["sizes"] = [s.strip() for s in d["sizes"].split(",") if s.strip()]
+        else:
+            d["sizes"] = []
+    if "images" in d:
+        if isinstance(d["images"], list):
+            pass
+        elif d["images"] and isinstance(d["images"], str):
+            try:
+                import json
+                d["images"] = json.loads(d["images"])
+            except Exception:
+                d["images"] = []
+        else:
+            d["images"] = []
+    if "stock" in d:
+        try:
+            d["stock"] = int(d["stock"])
+        except Exception:
+            d["stock"] = 0
+    if "price" not in d:
+        return d
+    try:
+        d["price"] = float(d["price"])
+    except Exception:
+        d["price"] = 0.0
+    if d.get("porcentaje_descuento") is not None:
+        try:
+            d["porcentaje_descuento"] = float(d["porcentaje_descuento"])
+            if d["porcentaje_descuento"] > 0:
+                descuento = d["price"] * (d["porcentaje_descuento"] / 100)
+                d["precio_efectivo"] = round(d["price"] - descuento, 2)
+            else:
+                d["precio_efectivo"] = d["price"]
+        except Exception:
+            d["porcentaje_descuento"] = None
+            d["precio_efectivo"] = d["price"]
+    else:
+        d["porcentaje_descuento"] = None
+        d["precio_efectivo"] = d["price"]
+    if "precio_efectivo" not in d:
+        if d.get("porcentaje_descuento") and d["porcentaje_descuento"] > 0:
+            descuento = d["price"] * (d["porcentaje_descuento"] / 100)
+            d["precio_efectivo"] = round(d["price"] - descuento, 2)
+        else:
+            d["precio_efectivo"] = d["price"]
+    return d
+
+
+def make_rows(n):
+    rows = []
+    for i in range(n):
+        rows.append((
+            i, f"Zapatilla Modelo {i}", "Nike", Decimal("45999.90") + i,
+            Decimal("15") if i % 3 == 0 else None,
+            # precio_efectivo: columna generada, la calcula la base
+            Decimal(str(round((45999.90 + i) - (45999.90 + i) * 0.15, 2))) if i % 3 == 0 else Decimal("45999.90") + i,
+            "Zapatillas", "nuevo",
+            ["38", "39", "40", "41"], 10 + i % 7,
+            f"https://res.cloudinary.com/demo/image/upload/p{i}.jpg",
+            [f"https://res.cloudinary.com/demo/image/upload/p{i}_{j}.jpg" for j in range(3)],
+            "active",
+        ))
+    return rows
+
+
+def measure(label, func, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    rate = len(rows) / best
+    print(f"  {label:<44} {rate:>12,.0f} filas/s")
+    return rate
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rows = make_rows(n)
+    columns = list(PRODUCT_COLUMNS)
+
+    app = Flask(__name__)
+    legacy_json = DefaultJSONProvider(app)
+    fast_json = FastJSONProvider(app)
+    serialize = compile_product_serializer(PRODUCT_COLUMNS)
+
+    # Mismo resultado en ambos caminos
+    legacy = [legacy_row_to_dict(r, columns=columns) for r in rows]
+    compiled = [serialize(r) for r in rows]
+    assert legacy == compiled, "El serializador compilado no coincide con row_to_dict"
+    assert json.loads(legacy_json.dumps(legacy)) == json.loads(fast_json.dumps(compiled))
+
+    print(f"{n} filas, mejor de {repeat} (orjson: {'sí' if ORJSON_AVAILABLE else 'no'})")
+    print("Filas -> dict")
+    before = measure("row_to_dict genérico", lambda rs: [legacy_row_to_dict(r, columns=columns) for r in rs], rows, repeat)
+    after = measure("serializador compilado", lambda rs: [serialize(r) for r in rs], rows, repeat)
+    print(f"  x{after / before:.1f}")
+
+    print("dict -> JSON")
+    before_json = measure("json estándar (DefaultJSONProvider)", lambda rs: legacy_json.dumps(legacy), rows, repeat)
+    after_json = measure("FastJSONProvider", lambda rs: fast_json.dumps(compiled), rows, repeat)
+    print(f"  x{after_json / before_json:.1f}")
+
+    print("Filas -> JSON (de punta a punta)")
+    before_all = measure("antes", lambda rs: legacy_json.dumps([legacy_row_to_dict(r, columns=columns) for r in rs]), rows, repeat)
+    after_all = measure("después", lambda rs: fast_json.dumps([serialize(r) for r in rs]), rows, repeat)
+    print(f"  x{after_all / before_all:.1f}")
+
+
+if __name__ == "__main__":
+    main()
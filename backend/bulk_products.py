@@ -0,0 +1,441 @@
+"""
+Importación y exportación masiva de productos con COPY.
+
+Importar: las filas (CSV con encabezado o NDJSON) se validan a medida que se
+leen y se envían a una tabla temporal con COPY FROM STDIN, sin armarlas todas
+en memoria. Después un único INSERT/UPDATE las aplica sobre productos usando
+el nombre (sin distinguir mayúsculas) como clave: si el producto existe se
+actualizan solo las columnas que vinieron con valor; si no, se crea.
+
+Exportar: COPY (SELECT ...) TO STDOUT en CSV, enviado al cliente a medida
+que la base lo produce. Un error a mitad del envío corta la conexión en vez
+de terminar la respuesta como si el archivo estuviera completo.
+"""
+import csv
+import json
+import math
+import queue
+import threading
+import time
+from database import get_conn, get_pool
+from catalog_cache import invalidate_catalog
+
+# Clave del advisory lock: dos importaciones a la vez podrían duplicar nombres
+IMPORT_LOCK_ID = 72_410_002
+MAX_REPORTED_ERRORS = 50
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Columnas aceptadas (solo name es obligatoria)
+IMPORT_COLUMNS = (
+    'name', 'brand', 'price', 'porcentaje_descuento', 'category', 'condition',
+    'sizes', 'stock', 'image', 'images', 'status',
+)
+FORMATS = ('csv', 'ndjson')
+# Largos de las columnas VARCHAR de productos: un valor más largo abortaría toda la importación
+TEXT_LIMITS = {'name': 255, 'brand': 100, 'category': 100, 'condition': 50, 'status': 50}
+MAX_PRICE = 99_999_999.99  # DECIMAL(10,2)
+MAX_STOCK = 2_147_483_647
+
+_STAGING_SQL = """
+    CREATE TEMP TABLE productos_import (
+        line INTEGER,
+        name TEXT,
+        brand TEXT,
+        price NUMERIC(10,2),
+        porcentaje_descuento NUMERIC(5,2),
+        category TEXT,
+        condition TEXT,
+        sizes JSONB,
+        stock INTEGER,
+        image TEXT,
+        images JSONB,
+        status TEXT
+    ) ON COMMIT DROP
+"""
+
+# Si el mismo nombre aparece varias veces en el archivo gana la última fila
+_UPSERT_SQL = """
+    WITH incoming AS (
+        SELECT DISTINCT ON (lower(name)) *
+        FROM productos_import
+        ORDER BY lower(name), line DESC
+    ),
+    updated AS (
+        UPDATE productos p SET
+            brand = COALESCE(i.brand, p.brand),
+            price = COALESCE(i.price, p.price),
+            porcentaje_descuento = COALESCE(i.porcentaje_descuento, p.porcentaje_descuento),
+            category = COALESCE(i.category, p.category),
+            condition = COALESCE(i.condition, p.condition),
+            sizes = CASE WHEN i.sizes IS NULL THEN p.sizes
+                         ELSE ARRAY(SELECT jsonb_array_elements_text(i.sizes)) END,
+            stock = COALESCE(i.stock, p.stock),
+            image = COALESCE(i.image, p.image),
+            images = COALESCE(i.images, p.images),
+            status = COALESCE(i.status, p.status)
+        FROM incoming i
+        WHERE lower(p.name) = lower(i.name)
+        RETURNING p.id
+    ),
+    inserted AS (
+        INSERT INTO productos (name, brand, price, porcentaje_descuento, category, condition,
+                               sizes, stock, image, images, status)
+        SELECT i.name, i.brand, COALESCE(i.price, 0), i.porcentaje_descuento, i.category,
+               COALESCE(i.condition, 'Nuevo'),
+               CASE WHEN i.sizes IS NULL THEN '{}'::text[]
+                    ELSE ARRAY(SELECT jsonb_array_elements_text(i.sizes)) END,
+               COALESCE(i.stock, 0), i.image, COALESCE(i.images, '[]'::jsonb),
+               COALESCE(i.status, 'Activo')
+        FROM incoming i
+        WHERE NOT EXISTS (SELECT 1 FROM productos p WHERE lower(p.name) = lower(i.name))
+        RETURNING id
+    )
+    SELECT (SELECT count(*) FROM updated) AS updated,
+           (SELECT count(*) FROM inserted) AS inserted
+"""
+
+# Mismo formato que acepta la importación (sizes separado por comas, images JSON)
+_EXPORT_SQL = """
+    COPY (
+        SELECT id, name, brand, price, porcentaje_descuento, precio_efectivo, category,
+               condition, array_to_string(sizes, ',') AS sizes, stock, image, images, status
+        FROM productos
+        ORDER BY id
+    ) TO STDOUT WITH (FORMAT csv, HEADER)
+"""
+
+_lock = threading.Lock()
+_counters = {
+    'imports': 0,
+    'imported_rows': 0,
+    'invalid_rows': 0,
+    'exports': 0,
+    'exported_rows': 0,
+    'export_errors': 0,
+    'last_import': None,
+    'last_export': None,
+}
+
+
+class InvalidImport(ValueError):
+    """Archivo de importación ilegible (responder 400)"""
+
+
+class ExportFailed(Exception):
+    """La exportación falló después de empezar a enviar el CSV"""
+
+
+# ---------------------- LECTURA Y VALIDACIÓN ----------------------
+
+def read_records(stream, fmt):
+    """(número de línea, registro) de un stream de texto CSV o NDJSON"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        # El encabezado se valida ya, antes de empezar el COPY
+        try:
+            header = [column.strip().lower() for column in (reader.fieldnames or [])]
+        except csv.Error as e:
+            raise InvalidImport(f"CSV mal formado: {e}")
+        if 'name' not in header:
+            raise InvalidImport("El CSV debe tener encabezado con al menos la columna 'name'")
+        reader.fieldnames = header
+        return _csv_records(reader)
+    if fmt == 'ndjson':
+        return ((line_no, line) for line_no, line in enumerate(stream, 1) if line.strip())
+    raise InvalidImport(f"Formato no soportado: {fmt}")
+
+
+def _csv_records(reader):
+    """Filas del CSV; un archivo mal formado (comillas sin cerrar, NUL) es InvalidImport"""
+    try:
+        for record in reader:
+            yield reader.line_num, record
+    except csv.Error as e:
+        raise InvalidImport(f"CSV mal formado (línea {reader.line_num}): {e}")
+
+
+def _text(record, field):
+    value = record.get(field)
+    if value is None:
+        return None
+    value = str(value).strip()
+    limit = TEXT_LIMITS.get(field)
+    if limit and len(value) > limit:
+        raise ValueError(f"'{field}' supera los {limit} caracteres")
+    return value or None
+
+
+def _number(record, field, low=None, high=None, integer=False):
+    value = record.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        number = int(value) if integer else float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' debe ser numérico")
+    if not math.isfinite(number):
+        raise ValueError(f"'{field}' debe ser numérico")
+    if (low is not None and number < low) or (high is not None and number > high):
+        raise ValueError(f"'{field}' fuera de rango")
+    return number
+
+
+def _list(value, field):
+    """Lista de textos: lista JSON, texto JSON o texto separado por comas"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        if value.startswith('['):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise ValueError(f"'{field}' no es un JSON válido")
+        else:
+            return [part.strip() for part in value.split(',') if part.strip()]
+    if not isinstance(value, list):
+        raise ValueError(f"'{field}' debe ser una lista")
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def normalize_record(record):
+    """Registro validado como tupla de IMPORT_COLUMNS (None = no vino, se conserva)"""
+    if isinstance(record, str):
+        try:
+            record = json.loads(record)
+        except ValueError:
+            raise ValueError("JSON inválido")
+    if not isinstance(record, dict):
+        raise ValueError("Cada fila debe ser un objeto")
+    name = _text(record, 'name')
+    if not name:
+        raise ValueError("'name' es obligatorio")
+    sizes = _list(record.get('sizes'), 'sizes')
+    images = _list(record.get('images'), 'images')
+    return (
+        name,
+        _text(record, 'brand'),
+        _number(record, 'price', low=0, high=MAX_PRICE),
+        _number(record, 'porcentaje_descuento', low=0, high=100),
+        _text(record, 'category'),
+        _text(record, 'condition'),
+        None if sizes is None else json.dumps(sizes),
+        _number(record, 'stock', low=0, high=MAX_STOCK, integer=True),
+        _text(record, 'image'),
+        None if images is None else json.dumps(images),
+        _text(record, 'status'),
+    )
+
+
+# ---------------------- COPY ----------------------
+
+def _copy_value(value):
+    """Valor en el formato de texto de COPY"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class _CopyReader:
+    """Archivo de solo lectura para COPY FROM STDIN que valida filas bajo demanda"""
+
+    def __init__(self, records, report):
+        self._records = iter(records)
+        self._report = report
+        self._buffer = ''
+        self._done = False
+        self.error = None  # InvalidImport al leer (COPY la reemplaza por su propio error)
+
+    def _next_line(self):
+        for line_no, record in self._records:
+            self._report['rows'] += 1
+            try:
+                values = normalize_record(record)
+            except ValueError as e:
+                self._report['invalid'] += 1
+                if len(self._report['errors']) < MAX_REPORTED_ERRORS:
+                    self._report['errors'].append({'line': line_no, 'error': str(e)})
+                continue
+            self._report['valid'] += 1
+            return '\t'.join(_copy_value(v) for v in (line_no,) + values) + '\n'
+        return None
+
+    def read(self, size=-1):
+        while not self._done and (size < 0 or len(self._buffer) < size):
+            try:
+                line = self._next_line()
+            except InvalidImport as e:
+                self.error = e
+                raise
+            if line is None:
+                self._done = True
+            else:
+                self._buffer += line
+        if size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def import_products(records):
+    """
+    Importa `records` (pares (línea, registro) como los de read_records) y
+    devuelve el resumen: filas leídas, válidas, insertadas, actualizadas,
+    errores y filas por segundo.
+    """
+    report = {'rows': 0, 'valid': 0, 'invalid': 0, 'inserted': 0, 'updated': 0, 'errors': []}
+    start = time.perf_counter()
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (IMPORT_LOCK_ID,))
+        cursor.execute(_STAGING_SQL)
+        reader = _CopyReader(records, report)
+        try:
+            cursor.copy_expert(
+                "COPY productos_import (line, " + ", ".join(IMPORT_COLUMNS) + ") FROM STDIN",
+                reader,
+            )
+        except Exception:
+            if reader.error is not None:
+                raise reader.error
+            raise
+        if report['valid']:
+            cursor.execute(_UPSERT_SQL)
+            counts = cursor.fetchone()
+            report['updated'], report['inserted'] = counts['updated'], counts['inserted']
+        conn.commit()
+    if report['valid']:
+        invalidate_catalog()
+
+    elapsed = time.perf_counter() - start
+    report['seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['rows'] / elapsed) if elapsed > 0 else None
+    with _lock:
+        _counters['imports'] += 1
+        _counters['imported_rows'] += report['valid']
+        _counters['invalid_rows'] += report['invalid']
+        _counters['last_import'] = {k: report[k] for k in ('rows', 'valid', 'seconds', 'rows_per_second')}
+    print(f"✅ Importación: {report['valid']}/{report['rows']} filas "
+          f"({report['inserted']} nuevas, {report['updated']} actualizadas) "
+          f"en {report['seconds']}s ({report['rows_per_second']} filas/s)")
+    return report
+
+
+class _QueueWriter:
+    """Archivo de escritura para COPY TO STDOUT que pasa bloques a otro hilo"""
+
+    def __init__(self, chunks, cancelled):
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._buffer = bytearray()
+        self.writes = 0  # COPY escribe un mensaje por fila (más el encabezado)
+
+    def write(self, data):
+        self.writes += 1
+        if self._cancelled.is_set():
+            raise IOError("Exportación cancelada por el cliente")
+        self._buffer += data if isinstance(data, bytes) else data.encode()
+        if len(self._buffer) >= EXPORT_CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        while self._buffer and not self._cancelled.is_set():
+            try:
+                self._chunks.put(bytes(self._buffer), timeout=1)
+                self._buffer = bytearray()
+            except queue.Full:
+                continue
+
+
+def export_products():
+    """
+    Arranca la exportación del catálogo (COPY TO STDOUT en CSV) y devuelve un
+    iterable de bloques (bytes).
+
+    La conexión se toma y el COPY empieza antes de volver: si fallan, la
+    excepción llega a la ruta (500). Un error a mitad del envío lanza
+    ExportFailed para que el servidor corte la conexión y el cliente no tome
+    un CSV truncado por completo.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    chunks = queue.Queue(maxsize=16)
+    cancelled = threading.Event()
+    result = {}
+
+    def run():
+        # Conexión propia del pool: el hilo de la petición sigue enviando mientras tanto
+        end = None
+        try:
+            cursor = conn.cursor()
+            writer = _QueueWriter(chunks, cancelled)
+            cursor.copy_expert(_EXPORT_SQL, writer)
+            writer.flush()
+            result['rows'] = max(writer.writes - 1, 0)
+        except Exception as e:
+            end = e
+        finally:
+            pool.putconn(conn)
+        # Fin de datos o el error (si el cliente se fue nadie lo va a leer)
+        while not cancelled.is_set():
+            try:
+                chunks.put(end, timeout=1)
+                break
+            except queue.Full:
+                continue
+
+    start = time.perf_counter()
+    try:
+        threading.Thread(target=run, name='products-export', daemon=True).start()
+    except Exception:
+        pool.putconn(conn)
+        raise
+    # El primer bloque (al menos el encabezado) confirma que el COPY arrancó
+    first = chunks.get()
+    if isinstance(first, Exception):
+        cancelled.set()
+        _export_failed(first)
+        raise first
+    return _stream_export(first, chunks, cancelled, result, start)
+
+
+def _stream_export(first, chunks, cancelled, result, start):
+    try:
+        chunk = first
+        while chunk is not None:
+            if isinstance(chunk, Exception):
+                _export_failed(chunk)
+                raise ExportFailed(f"Exportación interrumpida: {chunk}") from chunk
+            yield chunk
+            chunk = chunks.get()
+    finally:
+        cancelled.set()
+
+    elapsed = time.perf_counter() - start
+    rows = result.get('rows', 0)
+    report = {
+        'rows': rows,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed) if elapsed > 0 else None,
+    }
+    with _lock:
+        _counters['exports'] += 1
+        _counters['exported_rows'] += rows
+        _counters['last_export'] = report
+    print(f"✅ Exportación: {rows} productos en {report['seconds']}s ({report['rows_per_second']} filas/s)")
+
+
+def _export_failed(error):
+    with _lock:
+        _counters['export_errors'] += 1
+    print(f"❌ Error exportando productos: {error}")
+
+
+def get_bulk_stats():
+    """Contadores de importaciones/exportaciones del proceso"""
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,123 @@
+"""
+Caché LRU en memoria, segura entre hilos, con vencimiento opcional y contadores
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Caché acotada: al superar max_size descarta la entrada usada hace más tiempo"""
+
+    def __init__(self, name, max_size=256, ttl=None):
+        self.name = name
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl or None  # segundos; None o 0 = sin vencimiento
+        self._data = OrderedDict()  # clave -> (valor, instante de vencimiento)
+        self._lock = threading.Lock()
+        self._generation = 0  # aumenta con cada invalidación total
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, key, default=None):
+        """Devuelve el valor guardado (y lo marca como reciente) o `default`"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._data.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return value
+                del self._data[key]
+                self._counters['expirations'] += 1
+            self._counters['misses'] += 1
+            return default
+
+    def set(self, key, value, generation=None):
+        """Guarda un valor; si se pasa `generation` y hubo una invalidación desde entonces, se descarta"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            self._counters['sets'] += 1
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._counters['evictions'] += 1
+            return True
+
+    def get_or_load(self, key, loader):
+        """Devuelve el valor en caché o lo calcula con `loader()` y lo guarda"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        # Tomar la generación antes de leer: si alguien invalida durante la carga,
+        # el resultado (posiblemente viejo) no se guarda
+        generation = self.generation
+        value = loader()
+        self.set(key, value, generation=generation)
+        return value
+
+    def delete(self, key):
+        """Quita una entrada puntual"""
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def invalidate(self, key):
+        """Quita una entrada puntual y cuenta como invalidación (descarta cargas en curso)"""
+        with self._lock:
+            removed = self._data.pop(key, _MISSING) is not _MISSING
+            self._generation += 1
+            self._counters['invalidations'] += 1
+            return removed
+
+    def discard(self, predicate):
+        """Quita las entradas para las que predicate(clave, valor) es verdadero; cuenta como invalidación"""
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                del self._data[key]
+            # Una carga en curso de una entrada descartada no debe volver a guardarse
+            self._generation += 1
+            self._counters['invalidations'] += 1
+            return len(keys)
+
+    def clear(self):
+        """Invalida todas las entradas"""
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+            self._counters['invalidations'] += 1
+
+    @property
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """Contadores de uso de la caché"""
+        with self._lock:
+            data = dict(self._counters)
+            lookups = data['hits'] + data['misses']
+            data.update({
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hit_ratio': round(data['hits'] / lookups, 4) if lookups else None,
+            })
+        return data
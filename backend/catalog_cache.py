@@ -0,0 +1,66 @@
+"""
+Caché del catálogo público de productos (GET /api/products).
+
+Las entradas se indexan por la tupla normalizada de filtros y se invalidan
+por completo ante cualquier escritura sobre productos (alta, edición, baja,
+imágenes o descuento de stock por un pedido). Las escrituras hechas por
+otros procesos llegan por el feed de cambios (change_feed.py).
+"""
+from cache import LRUCache
+from change_feed import change_feed
+from database import get_conn
+from config import CATALOG_CACHE_MAX_ENTRIES, CATALOG_CACHE_TTL
+
+catalog_cache = LRUCache('catalog', max_size=CATALOG_CACHE_MAX_ENTRIES, ttl=CATALOG_CACHE_TTL)
+# (versión, última modificación) de catalog_version_slots, para ETag/Last-Modified
+version_cache = LRUCache('catalog_version', max_size=1, ttl=CATALOG_CACHE_TTL)
+
+
+# callback() a llamar después de cada invalidación (p. ej. el snapshot estático)
+_invalidation_listeners = []
+
+
+def on_invalidate(callback):
+    """Registra `callback()` para cada invalidación del catálogo"""
+    _invalidation_listeners.append(callback)
+
+
+def invalidate_catalog():
+    """Descarta el catálogo cacheado (llamar después del commit de la escritura)"""
+    catalog_cache.clear()
+    version_cache.clear()
+    for callback in _invalidation_listeners:
+        try:
+            callback()
+        except Exception as e:
+            print(f"❌ Error notificando invalidación del catálogo: {e}")
+
+
+def _load_catalog_version():
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT SUM(version)::bigint AS version, MAX(updated_at) AS updated_at FROM catalog_version_slots")
+        row = cursor.fetchone()
+    if not row or row['version'] is None:
+        return 0, None
+    return row['version'], row['updated_at']
+
+
+def get_catalog_version():
+    """Versión actual del catálogo: la suma de las filas de versión, cacheada hasta la próxima escritura"""
+    return version_cache.get_or_load('version', _load_catalog_version)
+
+
+def _on_product_change(event):
+    """Cambio en productos (de este u otro proceso): el catálogo entero queda viejo"""
+    invalidate_catalog()
+
+
+change_feed.subscribe('productos', _on_product_change)
+
+
+def get_catalog_stats():
+    """Contadores de la caché del catálogo"""
+    stats = catalog_cache.stats()
+    stats['version'] = version_cache.stats()
+    return stats
@@ -0,0 +1,264 @@
+"""
+Snapshot estático del catálogo público.
+
+Después de cada cambio en productos (invalidación del catálogo, hecha en este
+proceso o recibida por el feed de cambios) un hilo regenera el catálogo
+completo (lo mismo que /api/products?all=1) en el directorio del snapshot:
+
+- catalog.<hash>.json, .json.gz y .json.br (si hay brotli), precomprimidos.
+  El nombre cambia con el contenido, así que se sirven como inmutables.
+- catalog-manifest.json con el nombre vigente (sin caché).
+
+shop.js lee el manifiesto y después el archivo con hash; /api/products?all=1
+sin filtros responde con send_file del snapshot vigente, sin tocar la base.
+Las escrituras seguidas se agrupan en una sola regeneración (debounce).
+"""
+import gzip
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from flask import request, send_file, send_from_directory, abort
+from werkzeug.security import safe_join
+from database import get_pool
+from serializers import PRODUCT_COLUMNS, compile_product_serializer
+from catalog_cache import on_invalidate
+from json_provider import dumps_bytes
+from config import CATALOG_SNAPSHOT_ENABLED, CATALOG_SNAPSHOT_DIR, CATALOG_SNAPSHOT_DEBOUNCE
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+MANIFEST_NAME = 'catalog-manifest.json'
+SNAPSHOT_PATTERN = re.compile(r'^catalog\.[0-9a-f]{16}\.json$')
+KEEP_SNAPSHOTS = 3  # los clientes que ya leyeron un manifiesto anterior siguen pudiendo bajarlo
+RETRY_DELAY = 30
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# (Accept-Encoding, sufijo del archivo) en orden de preferencia
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_SNAPSHOT_SQL = "SELECT " + ", ".join(PRODUCT_COLUMNS) + " FROM productos ORDER BY id DESC"
+
+
+def _default_dir():
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'catalog'))
+
+
+def _write_atomic(path, data):
+    """Escribe a un temporal y renombra: nadie lee un archivo a medio escribir"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class CatalogSnapshot:
+    def __init__(self, directory=None):
+        self.directory = directory or CATALOG_SNAPSHOT_DIR or _default_dir()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._generation = 0  # invalidaciones vistas; el snapshot vigente es de una generación
+        self._current = None  # {'name', 'path', 'hash', 'version', 'variants', 'generation'}
+        self._counters = {
+            'publishes': 0,
+            'unchanged': 0,
+            'failures': 0,
+            'served': 0,
+        }
+        self._last = None
+
+    def start(self):
+        """Arranca el hilo publicador (una vez por proceso) y pide el primer snapshot"""
+        if not CATALOG_SNAPSHOT_ENABLED:
+            print("⚠️ Snapshot del catálogo deshabilitado (CATALOG_SNAPSHOT_ENABLED=false)")
+            return False
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return True
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='catalog-snapshot', daemon=True)
+            self._thread.start()
+        self.request_publish()
+        return True
+
+    def request_publish(self):
+        """El catálogo cambió: el snapshot actual deja de servirse hasta regenerarlo"""
+        with self._lock:
+            self._generation += 1
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Agrupar ráfagas de escrituras (p. ej. una importación o un lote de cambios)
+            time.sleep(CATALOG_SNAPSHOT_DEBOUNCE)
+            self._wake.clear()
+            try:
+                self.publish()
+            except Exception as e:
+                self._counters['failures'] += 1
+                print(f"❌ Error publicando el snapshot del catálogo: {e}")
+                time.sleep(RETRY_DELAY)
+                self._wake.set()
+
+    def _load(self):
+        """Versión y productos leídos en una misma foto de la base"""
+        serialize = compile_product_serializer(PRODUCT_COLUMNS)
+        with get_pool().connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cursor.execute("SELECT COALESCE(SUM(version), 0)::bigint FROM catalog_version_slots")
+            row = cursor.fetchone()
+            cursor.execute(_SNAPSHOT_SQL)
+            products = [serialize(r) for r in cursor.fetchall()]
+            conn.rollback()
+        return (row[0] if row else 0), products
+
+    def publish(self):
+        """Regenera el snapshot y el manifiesto"""
+        with self._lock:
+            generation = self._generation
+        start = time.perf_counter()
+        version, products = self._load()
+        body = dumps_bytes(products)
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        name = f"catalog.{digest}.json"
+        path = os.path.join(self.directory, name)
+        os.makedirs(self.directory, exist_ok=True)
+
+        sizes = {'json': len(body)}
+        if os.path.exists(path):
+            # Mismo contenido ya publicado (otro proceso o un cambio que no tocó el catálogo)
+            self._counters['unchanged'] += 1
+        else:
+            gz = gzip.compress(body, compresslevel=9, mtime=0)
+            _write_atomic(path + '.gz', gz)
+            sizes['gzip'] = len(gz)
+            if BROTLI_AVAILABLE:
+                br = brotli.compress(body, quality=11)
+                _write_atomic(path + '.br', br)
+                sizes['br'] = len(br)
+            # El .json va último: si existe, las variantes ya están escritas
+            _write_atomic(path, body)
+        variants = [suffix for _, suffix in ENCODINGS if os.path.exists(path + suffix)]
+
+        manifest = {
+            'file': name,
+            'hash': digest,
+            'version': version,
+            'count': len(products),
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+        }
+        _write_atomic(os.path.join(self.directory, MANIFEST_NAME), dumps_bytes(manifest))
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            # Si hubo otra invalidación mientras se armaba, ya viene otra regeneración
+            fresh = generation == self._generation
+            self._current = {
+                'name': name,
+                'path': path,
+                'hash': digest,
+                'version': version,
+                'variants': variants,
+                'generation': generation,
+            }
+            self._last = dict(manifest, bytes=sizes, seconds=round(elapsed, 3), fresh=fresh)
+        self._counters['publishes'] += 1
+        self._prune(keep=name)
+        print(f"✅ Snapshot del catálogo publicado: {name} ({len(products)} productos, {elapsed:.2f}s)")
+        return manifest
+
+    def _prune(self, keep):
+        """Borra los snapshots viejos (deja los KEEP_SNAPSHOTS más recientes)"""
+        try:
+            names = [n for n in os.listdir(self.directory) if SNAPSHOT_PATTERN.match(n)]
+        except OSError:
+            return
+        names.sort(key=lambda n: os.path.getmtime(os.path.join(self.directory, n)), reverse=True)
+        for name in names[KEEP_SNAPSHOTS:]:
+            if name == keep:
+                continue
+            for suffix in ('',) + tuple(suffix for _, suffix in ENCODINGS):
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except OSError:
+                    pass
+
+    def current(self):
+        """Snapshot vigente (None si no hay o si el catálogo cambió desde que se generó)"""
+        with self._lock:
+            current = self._current
+            if current is None or current['generation'] != self._generation:
+                return None
+            return current
+
+    def _send(self, path, variants, etag):
+        """send_file de la mejor variante precomprimida que acepte el cliente"""
+        encoding = None
+        for candidate, suffix in ENCODINGS:
+            if suffix in variants and request.accept_encodings[candidate]:
+                encoding, path = candidate, path + suffix
+                break
+        response = send_file(
+            path,
+            mimetype='application/json',
+            etag=f"{etag}.{encoding}" if encoding else etag,
+            conditional=True,
+            max_age=None,
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def response(self):
+        """Respuesta de /api/products?all=1 desde el snapshot (None: consultar la base)"""
+        current = self.current()
+        if current is None or not os.path.exists(current['path']):
+            return None
+        response = self._send(current['path'], current['variants'], current['hash'])
+        response.headers['Cache-Control'] = 'no-cache'
+        self._counters['served'] += 1
+        return response
+
+    def send_static(self, filename):
+        """Archivos del directorio del snapshot: el manifiesto sin caché, los snapshots inmutables"""
+        if filename == MANIFEST_NAME:
+            response = send_from_directory(self.directory, MANIFEST_NAME, max_age=0)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        if not SNAPSHOT_PATTERN.match(filename):
+            abort(404)
+        path = safe_join(self.directory, filename)
+        if path is None or not os.path.exists(path):
+            abort(404)
+        variants = [suffix for _, suffix in ENCODINGS if os.path.exists(path + suffix)]
+        response = self._send(path, variants, filename.split('.')[1])
+        response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+    def stats(self):
+        """Contadores del snapshot"""
+        with self._lock:
+            data = dict(self._counters)
+            data.update({
+                'enabled': CATALOG_SNAPSHOT_ENABLED,
+                'directory': self.directory,
+                'brotli': BROTLI_AVAILABLE,
+                'fresh': self._current is not None and self._current['generation'] == self._generation,
+                'last': self._last,
+            })
+        return data
+
+
+# Instancia global
+catalog_snapshot = CatalogSnapshot()
+on_invalidate(catalog_snapshot.request_publish)
@@ -0,0 +1,171 @@
+"""
+Feed de cambios entre procesos vía LISTEN/NOTIFY de PostgreSQL.
+
+Los triggers de la migración 10 publican en el canal CHANNEL un JSON
+{"table", "op", "id", "user_id"} por cada fila escrita en users y sessions;
+productos avisa una vez por sentencia, sin id (migración 17). Cada proceso
+corre un hilo que escucha el canal y avisa a las cachés suscriptas para que
+descarten lo que corresponda.
+
+Los avisos se procesan por tandas (todo lo que llegó en una lectura): los
+repetidos se descartan y si una tabla trae más de MAX_EVENTS_PER_TABLE (un
+DELETE masivo del mantenimiento, por ejemplo) sus suscriptores reciben un
+único RESYNC de esa tabla en lugar de un aviso por fila.
+
+Si la conexión de escucha se corta, al reconectar se envía a todos los
+suscriptores un evento op="RESYNC" (pudieron perderse avisos): la caché
+debe vaciarse por completo.
+"""
+import json
+import os
+import select
+import threading
+import psycopg2
+from database import get_connection_string
+from config import CHANGE_FEED_ENABLED
+
+CHANNEL = 'whip_changes'  # debe coincidir con notify_change() en migrations.py
+POLL_TIMEOUT = 5  # segundos entre chequeos de la conexión de escucha
+MAX_BACKOFF = 60
+MAX_EVENTS_PER_TABLE = 100  # por tanda; más que esto se resuelve con un RESYNC de la tabla
+
+
+class ChangeFeed:
+    def __init__(self, channel=CHANNEL):
+        self.channel = channel
+        self._subscribers = {}  # tabla -> [callback(evento)]
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._connected = False
+        self._counters = {
+            'received': 0,
+            'dispatched': 0,
+            'callback_errors': 0,
+            'invalid_payloads': 0,
+            'coalesced': 0,
+            'reconnects': 0,
+        }
+
+    def subscribe(self, table, callback):
+        """Registra `callback(evento)` para los cambios de `table`"""
+        with self._lock:
+            self._subscribers.setdefault(table, []).append(callback)
+
+    def start(self):
+        """Arranca el hilo de escucha (una vez por proceso)"""
+        if not CHANGE_FEED_ENABLED:
+            print("⚠️ Feed de cambios deshabilitado (CHANGE_FEED_ENABLED=false)")
+            return False
+        with self._lock:
+            # Tras un fork el hilo del padre no existe en el hijo: arrancar otro
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return True
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        backoff = 1
+        resync = False  # True si hubo un período sin escuchar
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(get_connection_string())
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.channel}")
+                self._connected = True
+                backoff = 1
+                if resync:
+                    # Pudieron perderse avisos mientras no escuchábamos
+                    self._counters['reconnects'] += 1
+                    print("🔄 Feed de cambios reconectado, resincronizando cachés")
+                    self._dispatch_all({'op': 'RESYNC', 'id': None, 'user_id': None})
+                else:
+                    print(f"✅ Escuchando cambios en el canal '{self.channel}'")
+                self._listen(conn)
+            except Exception as e:
+                print(f"⚠️ Feed de cambios desconectado: {e}")
+            finally:
+                self._connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            resync = True
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def _listen(self, conn):
+        while not self._stop.is_set():
+            if select.select([conn], [], [], POLL_TIMEOUT) == ([], [], []):
+                # Sin avisos: verificar que la conexión siga viva
+                conn.cursor().execute("SELECT 1")
+                continue
+            conn.poll()
+            payloads = [notify.payload for notify in conn.notifies]
+            del conn.notifies[:]
+            self._handle(payloads)
+
+    def _handle(self, payloads):
+        """Agrupa una tanda de avisos por tabla y los despacha sin repetidos"""
+        events = {}  # tabla -> {(op, id, user_id): evento}, en orden de llegada
+        valid = 0
+        for payload in payloads:
+            self._counters['received'] += 1
+            try:
+                event = json.loads(payload)
+                table = event['table']
+                key = (event.get('op'), event.get('id'), event.get('user_id'))
+            except (ValueError, TypeError, KeyError, AttributeError):
+                self._counters['invalid_payloads'] += 1
+                continue
+            valid += 1
+            events.setdefault(table, {}).setdefault(key, event)
+        for table, unique in events.items():
+            if len(unique) > MAX_EVENTS_PER_TABLE:
+                unique = {None: {'table': table, 'op': 'RESYNC', 'id': None, 'user_id': None}}
+            valid -= len(unique)
+            for event in unique.values():
+                self._dispatch(table, event)
+        self._counters['coalesced'] += valid
+
+    def _dispatch(self, table, event):
+        with self._lock:
+            callbacks = list(self._subscribers.get(table, ()))
+        for callback in callbacks:
+            try:
+                callback(event)
+                self._counters['dispatched'] += 1
+            except Exception as e:
+                self._counters['callback_errors'] += 1
+                print(f"❌ Error invalidando caché por cambio en {table}: {e}")
+
+    def _dispatch_all(self, event):
+        with self._lock:
+            tables = list(self._subscribers)
+        for table in tables:
+            self._dispatch(table, dict(event, table=table))
+
+    def stats(self):
+        """Contadores del feed de cambios"""
+        with self._lock:
+            subscriptions = {table: len(cbs) for table, cbs in self._subscribers.items()}
+        data = dict(self._counters)
+        data.update({
+            'enabled': CHANGE_FEED_ENABLED,
+            'connected': self._connected,
+            'subscriptions': subscriptions,
+        })
+        return data
+
+
+# Instancia global
+change_feed = ChangeFeed()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Verificación de planes de las consultas frecuentes.
+
+Siembra un set de datos dentro de una transacción, ejecuta ANALYZE y revisa
+con EXPLAIN que ninguna de las consultas calientes haga un Seq Scan sobre
+las tablas indexadas. Al terminar se hace rollback: no quedan datos.
+
+Uso:  python check_query_plans.py   (sale con código 1 si hay regresiones)
+Pensado para una base de desarrollo/CI con las migraciones aplicadas.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_pool
+from migrations import run_migrations
+from product_search import search_predicate
+
+SEED_PRODUCTS = 20000
+SEED_USERS = 2000
+SEED_ORDERS = 20000
+SEED_SESSIONS = 20000
+
+WATCHED_TABLES = {'productos', 'orders', 'order_items', 'sessions'}
+
+LIST_PRODUCTS_SQL = (
+    "SELECT id, name, brand, price, porcentaje_descuento, precio_efectivo, category, condition, sizes, stock, "
+    "image, images, status, created_at, updated_at FROM productos WHERE 1=1 {filter} ORDER BY id DESC"
+)
+
+# (descripción, SQL, parámetros) — copias de las consultas de server.py / auth.py / payment_handler.py
+CHECKS = [
+    (
+        "get_user_orders",
+        """
+        SELECT o.id, o.order_number, o.created_at
+        FROM orders o
+        WHERE o.user_id = %s OR o.customer_email = %s
+        ORDER BY o.created_at DESC
+        """,
+        (SEED_USERS // 2, 'plancheck-cliente-7@example.com'),
+    ),
+    (
+        "items de un pedido",
+        """
+        SELECT oi.product_id, oi.quantity, oi.price, p.name, p.brand
+        FROM order_items oi
+        LEFT JOIN productos p ON oi.product_id = p.id
+        WHERE oi.order_id = (SELECT max(id) FROM orders)
+        """,
+        None,
+    ),
+    (
+        "limpieza de sesiones vencidas (lote de maintenance.py)",
+        """
+        DELETE FROM sessions WHERE id IN (
+            SELECT id FROM sessions WHERE expires_at < NOW()
+            LIMIT %s FOR UPDATE SKIP LOCKED
+        )
+        """,
+        (1000,),
+    ),
+    (
+        "update_payment_status",
+        "UPDATE orders SET status = %s, updated_at = NOW() WHERE payment_id = %s",
+        ('approved', 'plancheck-pago-42'),
+    ),
+    (
+        "list_products por marca",
+        LIST_PRODUCTS_SQL.format(filter="AND LOWER(brand) = %s"),
+        ('plancheck-marca-3',),
+    ),
+    (
+        "list_products por categoría",
+        LIST_PRODUCTS_SQL.format(filter="AND LOWER(category) = %s"),
+        ('plancheck-categoria-5',),
+    ),
+    (
+        "list_products por estado",
+        LIST_PRODUCTS_SQL.format(filter="AND LOWER(status) = %s"),
+        ('plancheck-estado-2',),
+    ),
+    (
+        "list_products por talle",
+        LIST_PRODUCTS_SQL.format(filter="AND sizes @> ARRAY[%s]::text[]"),
+        ('plancheck-talle-9',),
+    ),
+    (
+        "list_products por precio efectivo",
+        LIST_PRODUCTS_SQL.format(filter="AND precio_efectivo >= %s AND precio_efectivo <= %s"),
+        (5000, 5100),
+    ),
+    (
+        "list_products ordenado por precio efectivo",
+        LIST_PRODUCTS_SQL.replace("ORDER BY id DESC", "ORDER BY precio_efectivo, id LIMIT 51").format(
+            filter="AND (precio_efectivo, id) > (%s, %s)"),
+        (5000, 0),
+    ),
+]
+
+
+def search_check():
+    """Búsqueda ?q= (se arma en tiempo de ejecución: depende de las columnas de búsqueda)"""
+    predicate, params = search_predicate('plancheck-producto-12345')
+    return ("list_products con búsqueda", LIST_PRODUCTS_SQL.format(filter="AND " + predicate), tuple(params))
+
+
+def seed(cursor):
+    """Inserta datos sintéticos (se descartan con el rollback final)"""
+    cursor.execute("""
+        INSERT INTO productos (name, brand, price, category, stock, status, sizes)
+        SELECT 'plancheck-producto-' || i,
+               'plancheck-marca-' || (i %% 200),
+               1000 + i,
+               'plancheck-categoria-' || (i %% 150),
+               i %% 20,
+               'plancheck-estado-' || (i %% 100),
+               ARRAY['plancheck-talle-' || (i %% 200)]
+        FROM generate_series(1, %s) AS i
+    """, (SEED_PRODUCTS,))
+    cursor.execute("""
+        INSERT INTO users (username, password_hash, email)
+        SELECT 'plancheck-usuario-' || i, 'x', 'plancheck-cliente-' || i || '@example.com'
+        FROM generate_series(1, %s) AS i
+    """, (SEED_USERS,))
+    cursor.execute("""
+        INSERT INTO orders (order_number, customer_name, customer_email, total_amount,
+                            status, payment_id, user_id, created_at)
+        SELECT 'plancheck-pedido-' || i,
+               'Cliente ' || i,
+               'plancheck-cliente-' || (i %% %s) || '@example.com',
+               1000,
+               'pending',
+               'plancheck-pago-' || i,
+               i %% %s,
+               NOW() - (i || ' minutes')::interval
+        FROM generate_series(1, %s) AS i
+    """, (SEED_USERS, SEED_USERS, SEED_ORDERS))
+    cursor.execute("""
+        INSERT INTO order_items (order_id, product_id, quantity, price)
+        SELECT o.id, (SELECT min(id) FROM productos), 1, 1000
+        FROM orders o
+        WHERE o.order_number LIKE 'plancheck-pedido-%'
+    """)
+    cursor.execute("""
+        INSERT INTO sessions (user_id, token, expires_at)
+        SELECT u.id, 'plancheck-token-' || u.id || '-' || i, NOW() + interval '1 day'
+        FROM (SELECT id FROM users WHERE username LIKE 'plancheck-usuario-%%' LIMIT 1) u,
+             generate_series(1, %s) AS i
+    """, (SEED_SESSIONS,))
+    for table in sorted(WATCHED_TABLES | {'users'}):
+        cursor.execute(f"ANALYZE {table}")
+
+
+def seq_scans(plan, found=None):
+    """Recorre el plan JSON y devuelve las tablas vigiladas leídas con Seq Scan"""
+    if found is None:
+        found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in WATCHED_TABLES:
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        seq_scans(child, found)
+    return found
+
+
+def check_query_plans():
+    """Devuelve la lista de (consulta, tablas con Seq Scan) que regresionaron"""
+    regressions = []
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            seed(cursor)
+            for name, sql, params in CHECKS + [search_check()]:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cursor.fetchone()[0][0]['Plan']
+                tables = seq_scans(plan)
+                if tables:
+                    print(f"❌ {name}: Seq Scan en {', '.join(sorted(set(tables)))}")
+                    regressions.append((name, tables))
+                else:
+                    print(f"✅ {name}: usa índices")
+        finally:
+            conn.rollback()
+    return regressions
+
+
+if __name__ == "__main__":
+    try:
+        run_migrations()
+        regressions = check_query_plans()
+    except Exception as e:
+        print(f"Error verificando planes: {e}")
+        sys.exit(1)
+    if regressions:
+        print(f"⚠️ {len(regressions)} consultas volvieron a Seq Scan")
+        sys.exit(1)
+    print("Todas las consultas frecuentes usan índices")
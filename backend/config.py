@@ -36,7 +36,8 @@ WEBHOOK_URL = f"{BASE_URL}/api/payment/webhook"
 
 # Configuración de la aplicación
 DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
-SECRET_KEY = os.environ.get('SECRET_KEY', 'cambia-esta-clave-secreta-en-produccion')
+DEFAULT_SECRET_KEY = 'cambia-esta-clave-secreta-en-produccion'  # solo desarrollo: nunca firma tokens
+SECRET_KEY = os.environ.get('SECRET_KEY', DEFAULT_SECRET_KEY)
 
 # Configuración de PostgreSQL
 DATABASE_URL = os.environ.get('DATABASE_URL', '')
@@ -57,12 +58,59 @@ def check_database_config():
         raise ValueError("DATABASE_URL es requerida. Configura PostgreSQL en Railway.")
     return True
 
+# Configuración del pool de conexiones a PostgreSQL
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))  # segundos esperando una conexión libre
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.environ.get('DB_POOL_HEALTHCHECK_INTERVAL', 30))  # ping si estuvo inactiva más de N segundos
+
+# Caché en memoria del catálogo (GET /api/products)
+CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', 256))  # combinaciones de filtros guardadas
+CATALOG_CACHE_TTL = float(os.environ.get('CATALOG_CACHE_TTL', 300))  # segundos; respaldo ante cambios hechos fuera de la app (0 = sin vencimiento)
+CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE', 50))  # productos por página si no se pasa ?limit=
+CATALOG_MAX_PAGE_SIZE = int(os.environ.get('CATALOG_MAX_PAGE_SIZE', 200))
+
+# Feed de cambios entre procesos (LISTEN/NOTIFY) para invalidar cachés
+CHANGE_FEED_ENABLED = os.environ.get('CHANGE_FEED_ENABLED', 'True').lower() == 'true'
+
+# Snapshot estático del catálogo (catalog.<hash>.json + .gz/.br), regenerado tras cada cambio
+CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', 'True').lower() == 'true'
+CATALOG_SNAPSHOT_DIR = os.environ.get('CATALOG_SNAPSHOT_DIR', '')  # vacío = assets/catalog del proyecto
+CATALOG_SNAPSHOT_DEBOUNCE = float(os.environ.get('CATALOG_SNAPSHOT_DEBOUNCE', 1))  # segundos para agrupar escrituras seguidas
+
+# Caché en memoria de sesiones validadas (evita ir a la base en cada petición autenticada)
+SESSION_CACHE_MAX_ENTRIES = int(os.environ.get('SESSION_CACHE_MAX_ENTRIES', 1024))
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', 30))  # segundos; 0 = sin caché
+
+# Mantenimiento en segundo plano: borra sesiones y tokens vencidos (un solo worker a la vez)
+MAINTENANCE_ENABLED = os.environ.get('MAINTENANCE_ENABLED', 'True').lower() == 'true'
+MAINTENANCE_INTERVAL = float(os.environ.get('MAINTENANCE_INTERVAL', 300))  # segundos entre corridas
+MAINTENANCE_BATCH_SIZE = int(os.environ.get('MAINTENANCE_BATCH_SIZE', 1000))  # filas por DELETE
+MAINTENANCE_MAX_BATCHES = int(os.environ.get('MAINTENANCE_MAX_BATCHES', 50))  # por tabla y corrida; el resto queda para la próxima
+
+# Listados del admin en NDJSON (Accept: application/x-ndjson): filas por viaje del cursor del servidor
+ADMIN_STREAM_ITERSIZE = int(os.environ.get('ADMIN_STREAM_ITERSIZE', 500))
+
 # Configuración de seguridad
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', SECRET_KEY)
 JWT_ACCESS_TOKEN_EXPIRES = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 3600))  # 1 hora
+# Tokens de sesión: 'opaque' (aleatorio, se busca en la base) o 'signed' (JWT con JWT_SECRET_KEY, se verifica en memoria)
+SESSION_TOKEN_MODE = os.environ.get('SESSION_TOKEN_MODE', 'opaque').lower()
+SESSION_REVOCATION_SYNC_INTERVAL = float(os.environ.get('SESSION_REVOCATION_SYNC_INTERVAL', 60))  # segundos entre fotos de sessions
+
+# bcrypt: costo (0 = calibrar al arrancar para BCRYPT_TARGET_MS) y pool acotado de hilos
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 0))
+BCRYPT_TARGET_MS = float(os.environ.get('BCRYPT_TARGET_MS', 250))  # milisegundos por hash buscados
+BCRYPT_MIN_ROUNDS = int(os.environ.get('BCRYPT_MIN_ROUNDS', 12))  # piso: el costo que usaba bcrypt.gensalt() antes de calibrar
+BCRYPT_MAX_ROUNDS = int(os.environ.get('BCRYPT_MAX_ROUNDS', 14))
+BCRYPT_MAX_CONCURRENCY = int(os.environ.get('BCRYPT_MAX_CONCURRENCY', 2))  # hashes simultáneos por proceso
+BCRYPT_QUEUE_TIMEOUT = float(os.environ.get('BCRYPT_QUEUE_TIMEOUT', 2))  # segundos esperando lugar antes de responder 429
 
 # Configuración de rate limiting
 RATE_LIMIT_PER_MINUTE = int(os.environ.get('RATE_LIMIT_PER_MINUTE', 60))
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()  # memory (por proceso) o sqlite (compartido entre workers)
+RATE_LIMIT_SQLITE_PATH = os.environ.get('RATE_LIMIT_SQLITE_PATH', '')  # vacío = archivo en el directorio temporal
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))  # claves (ip + acción) en memoria antes de descartar las menos usadas
 
 # Configuración de email (para futuras implementaciones)
 SMTP_SERVER = os.environ.get('SMTP_SERVER', '')
@@ -2,183 +2,381 @@
 Módulo para manejar conexiones a PostgreSQL
 """
 import os
+import threading
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor, Json
 from contextlib import contextmanager
+from flask import g, has_request_context
 from config import DATABASE_URL, PGHOST, PGPORT, PGDATABASE, PGUSER, PGPASSWORD
+from config import DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_INTERVAL
 
 def get_connection_string():
     """Obtiene la cadena de conexión a PostgreSQL"""
     from config import check_database_config
     check_database_config()  # Verificar que DATABASE_URL esté configurada
-    
+
     if DATABASE_URL:
         return DATABASE_URL
     else:
         return f"host={PGHOST} port={PGPORT} dbname={PGDATABASE} user={PGUSER} password={PGPASSWORD}"
 
+# ---------------------- POOL DE CONEXIONES ----------------------
+
+class PoolTimeoutError(Exception):
+    """No se obtuvo una conexión libre del pool dentro del tiempo de espera"""
+
+
+class ConnectionPool:
+    """Pool de conexiones a PostgreSQL compartido por todos los hilos del proceso"""
+
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=10, healthcheck_interval=30):
+        self.dsn = dsn
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._idle = []  # [(conexión, instante en que se devolvió)]
+        self._size = 0  # conexiones abiertas (libres + prestadas)
+        self._in_use = 0
+        self._cond = threading.Condition(threading.RLock())
+        self._counters = {
+            'created': 0,
+            'checkouts': 0,
+            'returns': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'healthchecks': 0,
+            'peak_in_use': 0,
+        }
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = False
+        with self._cond:
+            self._counters['created'] += 1
+        return conn
+
+    def open(self):
+        """Abre las conexiones mínimas configuradas"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _is_healthy(self, conn, idle_since):
+        """Health-check al prestar: descarta conexiones cerradas o rotas"""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - idle_since < self.healthcheck_interval:
+            return True
+        # Solo se hace ping si la conexión estuvo inactiva un buen rato
+        try:
+            with self._cond:
+                self._counters['healthchecks'] += 1
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self, timeout=None):
+        """Presta una conexión, esperando hasta `timeout` segundos si el pool está lleno"""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        conn, idle_since = None, None
+        with self._cond:
+            waited = False
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1  # Reservar el lugar antes de conectar fuera del lock
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"No hay conexiones libres en el pool (max_size={self.max_size})"
+                    )
+                if not waited:
+                    self._counters['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        try:
+            if conn is not None and not self._is_healthy(conn, idle_since):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._counters['discarded'] += 1
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._counters['checkouts'] += 1
+            self._counters['peak_in_use'] = max(self._counters['peak_in_use'], self._in_use)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Devuelve una conexión al pool dejándola en estado limpio"""
+        if not discard:
+            try:
+                if conn.closed:
+                    discard = True
+                else:
+                    # Reset al devolver: deshacer transacción pendiente y restaurar defaults
+                    if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                    if conn.autocommit:
+                        conn.autocommit = False
+                    conn.cursor_factory = None
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            self._counters['returns'] += 1
+            if discard:
+                self._counters['discarded'] += 1
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, cursor_factory=None):
+        """Context manager: presta una conexión y la devuelve al salir"""
+        conn = self.getconn()
+        try:
+            conn.cursor_factory = cursor_factory
+            yield conn
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        """Cierra las conexiones libres (las prestadas se cierran al devolverse)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Contadores de uso del pool"""
+        with self._cond:
+            data = dict(self._counters)
+            data.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        return data
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """Conexión prestada por el pool; close() la devuelve en lugar de cerrarla"""
+
+    def __init__(self, pool, conn, cursor_factory=None):
+        self._pool = pool
+        self._conn = conn
+        self._cursor_factory = cursor_factory
+
+    def cursor(self, *args, **kwargs):
+        if self._cursor_factory is not None and not args and 'cursor_factory' not in kwargs:
+            kwargs['cursor_factory'] = self._cursor_factory
+        return self._conn.cursor(*args, **kwargs)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.putconn(conn)
+
+    @property
+    def closed(self):
+        return 1 if self._conn is None else self._conn.closed
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already closed")
+        return getattr(self._conn, name)
+
+    def __del__(self):
+        # Si el llamador olvidó cerrar, no perder el lugar en el pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class RequestConnection(PooledConnection):
+    """Vista de la conexión compartida de la petición; se libera en el teardown"""
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        # La transacción pendiente se confirma antes de responder; solo se limpia
+        # una transacción abortada para que el resto de la petición pueda seguir
+        if conn is not None and not conn.closed:
+            if conn.get_transaction_status() == extensions.TRANSACTION_STATUS_INERROR:
+                conn.rollback()
+
+    def __del__(self):
+        pass
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Obtiene (o crea) el pool de conexiones del proceso"""
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # Un proceso hijo (fork) no puede reutilizar los sockets del padre
+            _pool = ConnectionPool(
+                get_connection_string(),
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT,
+                healthcheck_interval=DB_POOL_HEALTHCHECK_INTERVAL,
+            )
+            _pool_pid = os.getpid()
+            try:
+                _pool.open()
+            except Exception as e:
+                print(f"⚠️  No se pudieron abrir las conexiones mínimas del pool: {e}")
+    return _pool
+
+def get_pool_stats():
+    """Contadores del pool (vacío si todavía no se creó)"""
+    if _pool is None or _pool_pid != os.getpid():
+        return {}
+    return _pool.stats()
+
+# ---------------------- CONEXIÓN POR PETICIÓN ----------------------
+
+def get_request_conn():
+    """Conexión compartida por toda la petición HTTP, abierta al primer uso"""
+    conn = g.get('db_conn')
+    if conn is not None and conn.closed:
+        # La conexión se cayó a mitad de la petición: liberar su lugar y pedir otra
+        get_pool().putconn(conn, discard=True)
+        conn = None
+    if conn is None:
+        conn = get_pool().getconn()
+        g.db_conn = conn
+    return conn
+
+def mark_request_failed():
+    """Hace que la transacción de la petición se deshaga en lugar de confirmarse"""
+    if has_request_context():
+        g.db_rollback_only = True
+
+def commit_request_conn():
+    """
+    Confirma la transacción de la petición antes de enviar la respuesta.
+    Devuelve False si el COMMIT falló: lo escrito no quedó guardado y la
+    respuesta tiene que ser un error.
+    """
+    conn = g.get('db_conn')
+    if conn is None or g.get('db_rollback_only'):
+        return True
+    try:
+        if conn.closed:
+            raise psycopg2.InterfaceError("la conexión se cerró antes del commit")
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.commit()
+    except Exception as e:
+        print(f"❌ Error confirmando la transacción de la petición: {e}")
+        g.db_rollback_only = True
+        return False
+    return True
+
+def release_request_conn(exc=None):
+    """Teardown: deshace lo que no se confirmó antes de responder y devuelve la conexión al pool"""
+    conn = g.pop('db_conn', None)
+    g.pop('db_rollback_only', None)
+    if conn is None:
+        return
+    pool = get_pool()
+    if conn.closed:
+        pool.putconn(conn, discard=True)
+        return
+    try:
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except Exception as e:
+        print(f"⚠️  Error cerrando la transacción de la petición: {e}")
+        pool.putconn(conn, discard=True)
+        return
+    pool.putconn(conn)
+
+def get_pooled_conn(cursor_factory=None):
+    """Conexión del pool para código que llama conn.close() explícitamente"""
+    if has_request_context():
+        return RequestConnection(None, get_request_conn(), cursor_factory)
+    pool = get_pool()
+    return PooledConnection(pool, pool.getconn(), cursor_factory)
+
 @contextmanager
 def get_conn():
     """Context manager para conexiones a PostgreSQL"""
-    conn = None
+    if not has_request_context():
+        with get_pool().connection(cursor_factory=RealDictCursor) as conn:
+            yield conn
+        return
+
+    handle = RequestConnection(None, get_request_conn(), RealDictCursor)
     try:
-        conn = psycopg2.connect(get_connection_string(), cursor_factory=RealDictCursor)
-        conn.autocommit = False
-        yield conn
-    except Exception as e:
-        if conn:
+        yield handle
+    except Exception:
+        conn = g.get('db_conn')
+        if conn is not None and not conn.closed:
             conn.rollback()
-        raise e
+        raise
     finally:
-        if conn:
-            conn.close()
-
-def init_postgresql_tables():
-    """Inicializa las tablas en PostgreSQL"""
-    print("Inicializando tablas de PostgreSQL...")
-    
-    # Usar cursor normal para operaciones de inicialización
-    import psycopg2
-    from config import DATABASE_URL, PGHOST, PGPORT, PGDATABASE, PGUSER, PGPASSWORD, check_database_config
-    
-    # Verificar configuración
-    check_database_config()
-    
-    # Construir cadena de conexión
-    if DATABASE_URL:
-        conn = psycopg2.connect(DATABASE_URL)
-    else:
-        conn = psycopg2.connect(f"host={PGHOST} port={PGPORT} dbname={PGDATABASE} user={PGUSER} password={PGPASSWORD}")
-    cursor = conn.cursor()
-    print("DEBUG: Cursor created successfully")
-    
-    # Crear tabla de productos
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS productos (
-            id SERIAL PRIMARY KEY,
-            name VARCHAR(255) NOT NULL,
-            brand VARCHAR(100),
-            price DECIMAL(10,2) NOT NULL DEFAULT 0,
-            porcentaje_descuento DECIMAL(5,2) DEFAULT NULL,
-            category VARCHAR(100),
-            sizes TEXT,
-            stock INTEGER DEFAULT 0,
-            image TEXT,
-            images TEXT,
-            status VARCHAR(50),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Agregar columna porcentaje_descuento si no existe (para bases de datos existentes)
-    cursor.execute("""
-        ALTER TABLE productos 
-        ADD COLUMN IF NOT EXISTS porcentaje_descuento DECIMAL(5,2) DEFAULT NULL
-    """)
-    
-    # Migrar datos de precio_efectivo a porcentaje_descuento si existe la columna anterior
-    cursor.execute("""
-        DO $$
-        BEGIN
-            IF EXISTS (SELECT 1 FROM information_schema.columns 
-                      WHERE table_name = 'productos' AND column_name = 'precio_efectivo') THEN
-                -- Calcular porcentaje basado en precio_efectivo y price
-                UPDATE productos 
-                SET porcentaje_descuento = ROUND(((price - precio_efectivo) / price * 100), 2)
-                WHERE precio_efectivo IS NOT NULL AND price > 0;
-                
-                -- Eliminar columna precio_efectivo
-                ALTER TABLE productos DROP COLUMN IF EXISTS precio_efectivo;
-            END IF;
-        END $$;
-    """)
-    
-    # Crear tabla de usuarios
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            username VARCHAR(100) UNIQUE NOT NULL,
-            password_hash VARCHAR(255) NOT NULL,
-            role VARCHAR(50) NOT NULL DEFAULT 'user',
-            nombre VARCHAR(100),
-            apellido VARCHAR(100),
-            dni VARCHAR(20),
-            telefono VARCHAR(20),
-            direccion TEXT,
-            codigo_postal VARCHAR(10),
-            email VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Crear tabla de sesiones
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sessions (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            token VARCHAR(255) UNIQUE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-        )
-    """)
-    
-    # Crear tabla de órdenes
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS orders (
-            id SERIAL PRIMARY KEY,
-            order_number VARCHAR(50) UNIQUE NOT NULL,
-            customer_name VARCHAR(255) NOT NULL,
-            customer_email VARCHAR(255) NOT NULL,
-            customer_phone VARCHAR(20),
-            total_amount DECIMAL(10,2) NOT NULL,
-            status VARCHAR(50) DEFAULT 'pending',
-            payment_id VARCHAR(255),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Crear tabla de items de órdenes
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS order_items (
-            id SERIAL PRIMARY KEY,
-            order_id INTEGER NOT NULL,
-            product_id INTEGER NOT NULL,
-            quantity INTEGER NOT NULL,
-            price DECIMAL(10,2) NOT NULL,
-            FOREIGN KEY (order_id) REFERENCES orders (id) ON DELETE CASCADE,
-            FOREIGN KEY (product_id) REFERENCES productos (id)
-        )
-    """)
-    
-    conn.commit()
-    print("Tablas de PostgreSQL creadas correctamente")
-    
-    # Verificar que las tablas se crearon
-    cursor.execute("""
-        SELECT table_name 
-        FROM information_schema.tables 
-        WHERE table_schema = 'public'
-    """)
-    tables = cursor.fetchall()
-    print(f"DEBUG: Tables result: {tables}")
-    print(f"DEBUG: Tables type: {type(tables)}")
-    
-    if tables:
-        table_names = []
-        for table in tables:
-            if isinstance(table, (list, tuple)) and len(table) > 0:
-                table_names.append(table[0])
-            else:
-                print(f"DEBUG: Unexpected table format: {table}")
-        print(f"DEBUG: Tables created: {table_names}")
-    else:
-        print("DEBUG: No tables found")
-    
-    conn.close()
+        handle.close()
 
 def insert_sample_products():
     """Inserta productos de ejemplo en PostgreSQL"""
@@ -238,7 +436,7 @@ def insert_sample_products():
             INSERT INTO productos (name, brand, price, porcentaje_descuento, category, sizes, stock, image, images, status)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """,
-            [(p[0], p[1], p[2], p[3], p[4], p[5], p[6], p[7], '[]', p[8]) for p in sample_products]
+            [(p[0], p[1], p[2], p[3], p[4], p[5].split(','), p[6], p[7], Json([]), p[8]) for p in sample_products]
         )
         
         conn.commit()
@@ -308,8 +506,9 @@ def insert_sample_users():
 def init_postgresql():
     """Inicializa completamente PostgreSQL"""
     try:
-        print("Creando tablas...")
-        init_postgresql_tables()
+        print("Aplicando migraciones pendientes...")
+        from migrations import run_migrations
+        run_migrations()
         
         print("Insertando productos de ejemplo...")
         insert_sample_products()
@@ -0,0 +1,59 @@
+"""
+Proveedor JSON de la app Flask.
+
+Con orjson instalado las respuestas se codifican en C directamente a bytes;
+si no está, se usa el json de la librería estándar (el de Flask de siempre).
+En ambos casos la salida es equivalente: claves ordenadas, fechas en formato
+HTTP y Decimal como texto, igual que el proveedor por defecto de Flask.
+"""
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+if ORJSON_AVAILABLE:
+    # Fechas a default (formato HTTP, como Flask); claves no-str como hace json
+    _ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def dumps_bytes(obj):
+    """JSON compacto en bytes (UTF-8, claves ordenadas), fuera de una respuesta de Flask"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider que usa orjson cuando está disponible"""
+
+    def dumps(self, obj, **kwargs):
+        if not ORJSON_AVAILABLE or kwargs:
+            # Argumentos propios de json.dumps (indent, cls, ...): camino estándar
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        if not ORJSON_AVAILABLE or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if not ORJSON_AVAILABLE or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def install_json_provider(app):
+    """Reemplaza el proveedor JSON de `app` por FastJSONProvider"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    if ORJSON_AVAILABLE:
+        print("✅ Respuestas JSON con orjson")
+    else:
+        print("⚠️ orjson no disponible, usando json estándar")
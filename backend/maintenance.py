@@ -0,0 +1,146 @@
+"""
+Mantenimiento periódico en segundo plano.
+
+Un hilo por proceso corre cada MAINTENANCE_INTERVAL segundos y borra las
+filas vencidas de sessions, password_reset_tokens y email_verification_tokens.
+Cada tabla se borra en lotes acotados (MAINTENANCE_BATCH_SIZE filas, una
+transacción corta por lote). Una corrida no pasa de MAINTENANCE_MAX_BATCHES
+lotes por tabla; lo que quede se borra en la siguiente.
+
+Con varios workers solo corre uno a la vez: la corrida toma un advisory lock
+con pg_try_advisory_lock y, si otro proceso lo tiene, se saltea.
+"""
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from database import get_pool
+from config import MAINTENANCE_ENABLED, MAINTENANCE_INTERVAL, MAINTENANCE_BATCH_SIZE, MAINTENANCE_MAX_BATCHES
+
+MAINTENANCE_LOCK_ID = 72_410_003
+
+# Tablas con filas de vida limitada (todas con id y expires_at indexado)
+EXPIRING_TABLES = ('sessions', 'password_reset_tokens', 'email_verification_tokens')
+
+_DELETE_SQL = """
+    DELETE FROM {table} WHERE id IN (
+        SELECT id FROM {table} WHERE expires_at < NOW()
+        LIMIT %s FOR UPDATE SKIP LOCKED
+    )
+"""
+
+
+class Maintenance:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._counters = {
+            'runs': 0,
+            'skipped_locked': 0,
+            'failures': 0,
+        }
+        self._deleted = {table: 0 for table in EXPIRING_TABLES}
+        self._last_run = None
+
+    def start(self):
+        """Arranca el hilo de mantenimiento (una vez por proceso)"""
+        if not MAINTENANCE_ENABLED:
+            print("⚠️ Mantenimiento en segundo plano deshabilitado (MAINTENANCE_ENABLED=false)")
+            return False
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return True
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # Desfasar los workers para que no compitan por el lock al mismo tiempo
+        if self._stop.wait(random.uniform(0, min(MAINTENANCE_INTERVAL, 30))):
+            return
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self._counters['failures'] += 1
+                print(f"❌ Error en el mantenimiento: {e}")
+            if self._stop.wait(MAINTENANCE_INTERVAL):
+                return
+
+    def run_once(self):
+        """Una corrida completa; devuelve {tabla: filas borradas} o None si otro worker tiene el lock"""
+        with get_pool().connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (MAINTENANCE_LOCK_ID,))
+            locked = cursor.fetchone()[0]
+            conn.commit()
+            if not locked:
+                with self._lock:
+                    self._counters['skipped_locked'] += 1
+                return None
+
+            start = time.perf_counter()
+            deleted = {}
+            try:
+                for table in EXPIRING_TABLES:
+                    deleted[table] = self._purge(conn, cursor, table)
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MAINTENANCE_LOCK_ID,))
+                conn.commit()
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._counters['runs'] += 1
+            for table, count in deleted.items():
+                self._deleted[table] += count
+            self._last_run = {
+                'at': datetime.now().isoformat(),
+                'seconds': round(elapsed, 3),
+                'deleted': deleted,
+            }
+        if any(deleted.values()):
+            print(f"✅ Mantenimiento: {deleted} borradas en {elapsed:.2f}s")
+        return deleted
+
+    @staticmethod
+    def _purge(conn, cursor, table):
+        """Borra las filas vencidas de `table` en lotes; devuelve cuántas borró"""
+        query = _DELETE_SQL.format(table=table)
+        total = 0
+        for _ in range(MAINTENANCE_MAX_BATCHES):
+            try:
+                cursor.execute(query, (MAINTENANCE_BATCH_SIZE,))
+                count = cursor.rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            total += count
+            if count < MAINTENANCE_BATCH_SIZE:
+                break
+        return total
+
+    def stats(self):
+        """Contadores del mantenimiento"""
+        with self._lock:
+            data = dict(self._counters)
+            data.update({
+                'enabled': MAINTENANCE_ENABLED,
+                'interval': MAINTENANCE_INTERVAL,
+                'deleted': dict(self._deleted),
+                'last_run': self._last_run,
+            })
+        return data
+
+
+# Instancia global
+maintenance = Maintenance()
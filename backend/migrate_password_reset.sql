@@ -1,24 +0,0 @@
--- Migración para tabla de recuperación de contraseñas
--- Ejecutar en PostgreSQL
-
-CREATE TABLE IF NOT EXISTS password_reset_tokens (
-    id SERIAL PRIMARY KEY,
-    user_id INTEGER NOT NULL,
-    token VARCHAR(255) NOT NULL UNIQUE,
-    email VARCHAR(255) NOT NULL,
-    expires_at TIMESTAMP NOT NULL,
-    used BOOLEAN DEFAULT FALSE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-);
-
--- Índices para mejor rendimiento
-CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_token ON password_reset_tokens(token);
-CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_user_id ON password_reset_tokens(user_id);
-CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_expires_at ON password_reset_tokens(expires_at);
-
--- Comentarios
-COMMENT ON TABLE password_reset_tokens IS 'Tokens para recuperación de contraseñas';
-COMMENT ON COLUMN password_reset_tokens.token IS 'Token único para reset de contraseña';
-COMMENT ON COLUMN password_reset_tokens.expires_at IS 'Fecha de expiración del token (1 hora)';
-COMMENT ON COLUMN password_reset_tokens.used IS 'Si el token ya fue usado';
@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""
+Migraciones versionadas de la base de datos.
+
+Cada paso se aplica una única vez y queda registrado en la tabla
+schema_migrations. Al iniciar solo se lee esa tabla: si no hay pasos
+pendientes no se ejecuta ningún DDL.
+
+Uso manual:  python migrations.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import get_pool
+
+# Clave del advisory lock para que un solo proceso migre a la vez
+MIGRATIONS_LOCK_ID = 72_410_001
+
+
+class Migration:
+    def __init__(self, version, name, statements):
+        self.version = version
+        self.name = name
+        self.statements = statements  # lista de SQL o función(cursor)
+
+    def apply(self, cursor):
+        if callable(self.statements):
+            self.statements(cursor)
+            return
+        for sql in self.statements:
+            cursor.execute(sql)
+
+
+MIGRATIONS = []
+
+def migration(version, name, statements):
+    """Registra un paso de migración (las versiones deben ser crecientes)"""
+    if MIGRATIONS and version <= MIGRATIONS[-1].version:
+        raise ValueError(f"Versión de migración fuera de orden: {version}")
+    MIGRATIONS.append(Migration(version, name, statements))
+
+
+# ---------------------- PASOS ----------------------
+
+# Antes: database.init_postgresql_tables (ejecutado en cada arranque)
+migration(1, "tablas_iniciales", [
+    """
+    CREATE TABLE IF NOT EXISTS productos (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        brand VARCHAR(100),
+        price DECIMAL(10,2) NOT NULL DEFAULT 0,
+        porcentaje_descuento DECIMAL(5,2) DEFAULT NULL,
+        category VARCHAR(100),
+        sizes TEXT,
+        stock INTEGER DEFAULT 0,
+        image TEXT,
+        images TEXT,
+        status VARCHAR(50),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(100) UNIQUE NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        role VARCHAR(50) NOT NULL DEFAULT 'user',
+        nombre VARCHAR(100),
+        apellido VARCHAR(100),
+        dni VARCHAR(20),
+        telefono VARCHAR(20),
+        direccion TEXT,
+        codigo_postal VARCHAR(10),
+        email VARCHAR(255),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        token VARCHAR(255) UNIQUE NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP NOT NULL,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS orders (
+        id SERIAL PRIMARY KEY,
+        order_number VARCHAR(50) UNIQUE NOT NULL,
+        customer_name VARCHAR(255) NOT NULL,
+        customer_email VARCHAR(255) NOT NULL,
+        customer_phone VARCHAR(20),
+        total_amount DECIMAL(10,2) NOT NULL,
+        status VARCHAR(50) DEFAULT 'pending',
+        payment_id VARCHAR(255),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS order_items (
+        id SERIAL PRIMARY KEY,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        price DECIMAL(10,2) NOT NULL,
+        FOREIGN KEY (order_id) REFERENCES orders (id) ON DELETE CASCADE,
+        FOREIGN KEY (product_id) REFERENCES productos (id)
+    )
+    """,
+])
+
+# Antes: ALTER + bloque DO $$ de init_postgresql_tables
+migration(2, "productos_porcentaje_descuento", [
+    """
+    ALTER TABLE productos
+    ADD COLUMN IF NOT EXISTS porcentaje_descuento DECIMAL(5,2) DEFAULT NULL
+    """,
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM information_schema.columns
+                  WHERE table_name = 'productos' AND column_name = 'precio_efectivo') THEN
+            -- Calcular porcentaje basado en precio_efectivo y price
+            UPDATE productos
+            SET porcentaje_descuento = ROUND(((price - precio_efectivo) / price * 100), 2)
+            WHERE precio_efectivo IS NOT NULL AND price > 0;
+
+            -- Eliminar columna precio_efectivo
+            ALTER TABLE productos DROP COLUMN IF EXISTS precio_efectivo;
+        END IF;
+    END $$;
+    """,
+])
+
+# Columna usada por todas las consultas de productos y ausente de la tabla inicial
+migration(3, "productos_condition", [
+    "ALTER TABLE productos ADD COLUMN IF NOT EXISTS condition VARCHAR(50) DEFAULT 'Nuevo'",
+])
+
+# Antes: migrate_postgresql.py (la parte de precio_efectivo la revierte el paso 2)
+migration(4, "productos_images", [
+    "ALTER TABLE productos ADD COLUMN IF NOT EXISTS images TEXT DEFAULT '[]'",
+    "UPDATE productos SET images = '[]' WHERE images IS NULL OR images = ''",
+])
+
+# Antes: migrate_database.create_orders_table / create_order_items_table
+migration(5, "orders_datos_de_envio", [
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS payment_method VARCHAR(50) DEFAULT 'mercadopago'",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS customer_address TEXT",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS customer_city VARCHAR(100)",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS customer_zip VARCHAR(10)",
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS user_id INTEGER",
+    "ALTER TABLE order_items ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+])
+
+# Antes: migrate_database.add_verification_code_column
+migration(6, "orders_verification_code", [
+    "ALTER TABLE orders ADD COLUMN IF NOT EXISTS verification_code VARCHAR(20)",
+    """
+    UPDATE orders
+    SET verification_code = UPPER(SUBSTRING(MD5(order_number || EXTRACT(EPOCH FROM created_at)::text), 1, 8))
+    WHERE verification_code IS NULL
+    """,
+])
+
+# Antes: migrate_password_reset.sql / run_migration.py y el CREATE TABLE de forgot_password
+migration(7, "password_reset_tokens", [
+    """
+    CREATE TABLE IF NOT EXISTS password_reset_tokens (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        token VARCHAR(255) NOT NULL UNIQUE,
+        email VARCHAR(255) NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        used BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_token ON password_reset_tokens(token)",
+    "CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_user_id ON password_reset_tokens(user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_expires_at ON password_reset_tokens(expires_at)",
+    "COMMENT ON TABLE password_reset_tokens IS 'Tokens para recuperación de contraseñas'",
+    "COMMENT ON COLUMN password_reset_tokens.token IS 'Token único para reset de contraseña'",
+    "COMMENT ON COLUMN password_reset_tokens.expires_at IS 'Fecha de expiración del token (1 hora)'",
+    "COMMENT ON COLUMN password_reset_tokens.used IS 'Si el token ya fue usado'",
+])
+
+# Antes: migrate_email_verification.sql (sintaxis SQLite) y el DDL de auth_register
+migration(8, "email_verification", [
+    """
+    CREATE TABLE IF NOT EXISTS email_verification_tokens (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        token TEXT NOT NULL UNIQUE,
+        email TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP NOT NULL,
+        used BOOLEAN DEFAULT FALSE,
+        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_email_verification_user ON email_verification_tokens (user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_email_verification_email ON email_verification_tokens (email)",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS email_verified BOOLEAN DEFAULT FALSE",
+    "CREATE INDEX IF NOT EXISTS idx_users_email_verified ON users (email_verified)",
+])
+
+# Índices para los predicados de las consultas más frecuentes
+# (verificar con: python check_query_plans.py)
+migration(9, "indices_consultas_frecuentes", [
+    # get_user_orders: WHERE user_id = %s OR customer_email = %s ORDER BY created_at DESC
+    "CREATE INDEX IF NOT EXISTS idx_orders_user_id_created_at ON orders (user_id, created_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_customer_email_created_at ON orders (customer_email, created_at DESC)",
+    # update_payment_status / process_webhook: WHERE payment_id = %s
+    "CREATE INDEX IF NOT EXISTS idx_orders_payment_id ON orders (payment_id)",
+    # Items de cada pedido
+    "CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id)",
+    # Limpieza de sesiones vencidas: DELETE ... WHERE expires_at < NOW()
+    "CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)",
+    # list_products: filtros por LOWER(brand) / LOWER(category) / LOWER(status)
+    "CREATE INDEX IF NOT EXISTS idx_productos_lower_brand ON productos (LOWER(brand))",
+    "CREATE INDEX IF NOT EXISTS idx_productos_lower_category ON productos (LOWER(category))",
+    "CREATE INDEX IF NOT EXISTS idx_productos_lower_status ON productos (LOWER(status))",
+])
+
+# Feed de cambios: cada escritura en estas tablas avisa por NOTIFY (ver change_feed.py)
+migration(10, "notify_cambios", [
+    """
+    CREATE OR REPLACE FUNCTION notify_change() RETURNS trigger AS $$
+    DECLARE
+        rec RECORD;
+        owner_id INTEGER;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            rec := OLD;
+        ELSE
+            rec := NEW;
+        END IF;
+        IF TG_TABLE_NAME = 'sessions' THEN
+            owner_id := rec.user_id;
+        END IF;
+        PERFORM pg_notify('whip_changes', json_build_object(
+            'table', TG_TABLE_NAME,
+            'op', TG_OP,
+            'id', rec.id,
+            'user_id', owner_id
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS productos_notify_change ON productos",
+    "CREATE TRIGGER productos_notify_change AFTER INSERT OR UPDATE OR DELETE ON productos FOR EACH ROW EXECUTE FUNCTION notify_change()",
+    "DROP TRIGGER IF EXISTS users_notify_change ON users",
+    "CREATE TRIGGER users_notify_change AFTER INSERT OR UPDATE OR DELETE ON users FOR EACH ROW EXECUTE FUNCTION notify_change()",
+    "DROP TRIGGER IF EXISTS sessions_notify_change ON sessions",
+    "CREATE TRIGGER sessions_notify_change AFTER INSERT OR UPDATE OR DELETE ON sessions FOR EACH ROW EXECUTE FUNCTION notify_change()",
+])
+
+# Versión del catálogo para ETag/Last-Modified: se incrementa en cada sentencia
+# que escribe productos (incluye bajas y descuentos de stock). Está repartida
+# en 64 filas para que escrituras concurrentes (el checkout descontando stock)
+# no se esperen entre sí: cada conexión incrementa la fila de su backend y la
+# versión es la suma. Sigue siendo transaccional (una secuencia avanzaría antes
+# del commit y una lectura en ese momento etiquetaría datos viejos como nuevos).
+migration(11, "version_catalogo", [
+    """
+    CREATE TABLE IF NOT EXISTS catalog_version_slots (
+        slot SMALLINT PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+    """,
+    "INSERT INTO catalog_version_slots (slot) SELECT generate_series(0, 63) ON CONFLICT (slot) DO NOTHING",
+    """
+    CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+    BEGIN
+        UPDATE catalog_version_slots SET version = version + 1, updated_at = clock_timestamp()
+        WHERE slot = pg_backend_pid() % 64;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS productos_bump_catalog_version ON productos",
+    """
+    CREATE TRIGGER productos_bump_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON productos
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """,
+    # updated_at no lo actualizaba ningún UPDATE de la app
+    """
+    CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := CURRENT_TIMESTAMP;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS productos_set_updated_at ON productos",
+    "CREATE TRIGGER productos_set_updated_at BEFORE UPDATE ON productos FOR EACH ROW EXECUTE FUNCTION set_updated_at()",
+])
+
+# Búsqueda de productos: full-text en español sin acentos + trigramas para errores de tipeo
+migration(12, "busqueda_productos", [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() es STABLE: el wrapper con diccionario fijo permite usarlo en columnas generadas e índices
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS $$
+        SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION es_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END $$;
+    """,
+    """
+    ALTER TABLE productos ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('es_unaccent', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('es_unaccent', coalesce(brand, '')), 'B') ||
+        setweight(to_tsvector('es_unaccent', coalesce(category, '')), 'C')
+    ) STORED
+    """,
+    """
+    ALTER TABLE productos ADD COLUMN IF NOT EXISTS search_text TEXT
+    GENERATED ALWAYS AS (
+        lower(f_unaccent(coalesce(name, '') || ' ' || coalesce(brand, '') || ' ' || coalesce(category, '')))
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_productos_search_vector ON productos USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS idx_productos_search_text_trgm ON productos USING GIN (search_text gin_trgm_ops)",
+])
+
+# sizes: CSV en TEXT -> text[]; images: JSON en TEXT -> jsonb (conversión en el lugar)
+migration(13, "productos_tipos_nativos", [
+    # Si algún images no es JSON válido (o no es un arreglo) queda como []
+    """
+    CREATE OR REPLACE FUNCTION pg_temp.to_jsonb_array(value TEXT) RETURNS jsonb AS $$
+    DECLARE
+        parsed jsonb;
+    BEGIN
+        IF value IS NULL OR btrim(value) = '' THEN
+            RETURN '[]'::jsonb;
+        END IF;
+        parsed := value::jsonb;
+        IF jsonb_typeof(parsed) = 'array' THEN
+            RETURN parsed;
+        END IF;
+        RETURN '[]'::jsonb;
+    EXCEPTION WHEN others THEN
+        RETURN '[]'::jsonb;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "ALTER TABLE productos ALTER COLUMN images DROP DEFAULT",
+    "ALTER TABLE productos ALTER COLUMN images TYPE jsonb USING pg_temp.to_jsonb_array(images)",
+    "ALTER TABLE productos ALTER COLUMN images SET DEFAULT '[]'::jsonb",
+    "UPDATE productos SET images = '[]'::jsonb WHERE images IS NULL",
+    r"""
+    ALTER TABLE productos ALTER COLUMN sizes TYPE text[] USING (
+        CASE WHEN sizes IS NULL OR btrim(sizes) = '' THEN '{}'::text[]
+             ELSE array_remove(regexp_split_to_array(btrim(sizes), '\s*,\s*'), '')
+        END
+    )
+    """,
+    "ALTER TABLE productos ALTER COLUMN sizes SET DEFAULT '{}'::text[]",
+    # Filtro por talle: sizes @> ARRAY[...]
+    "CREATE INDEX IF NOT EXISTS idx_productos_sizes ON productos USING GIN (sizes)",
+])
+
+# Precio con descuento calculado por la base (antes se calculaba en Python en
+# cada lectura); indexado para ?sort=precio_efectivo y ?min_effective_price=
+migration(14, "productos_precio_efectivo_generado", [
+    "ALTER TABLE productos DROP COLUMN IF EXISTS precio_efectivo",
+    """
+    ALTER TABLE productos ADD COLUMN precio_efectivo DECIMAL(10,2)
+    GENERATED ALWAYS AS (
+        CASE WHEN porcentaje_descuento > 0
+             THEN round(price - price * porcentaje_descuento / 100, 2)
+             ELSE price
+        END
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_productos_precio_efectivo ON productos (precio_efectivo, id)",
+])
+
+# La importación masiva busca productos por nombre sin distinguir mayúsculas
+migration(15, "indice_nombre_productos", [
+    "CREATE INDEX IF NOT EXISTS idx_productos_lower_name ON productos (LOWER(name))",
+])
+
+# Limpieza periódica de tokens vencidos (maintenance.py): DELETE ... WHERE expires_at < NOW()
+migration(16, "indice_vencimiento_verificacion_email", [
+    "CREATE INDEX IF NOT EXISTS idx_email_verification_expires_at ON email_verification_tokens (expires_at)",
+])
+
+
+# Avisos de productos por sentencia: COPY, PATCH en lote o un UPDATE masivo
+# mandaban un NOTIFY por fila y cada uno vaciaba el catálogo de cada proceso.
+# La caché invalida el catálogo entero, así que el id no hace falta.
+migration(17, "notify_productos_por_sentencia", [
+    """
+    CREATE OR REPLACE FUNCTION notify_statement_change() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('whip_changes', json_build_object(
+            'table', TG_TABLE_NAME,
+            'op', TG_OP,
+            'id', NULL,
+            'user_id', NULL
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS productos_notify_change ON productos",
+    """
+    CREATE TRIGGER productos_notify_change
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON productos
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_statement_change()
+    """,
+])
+
+
+# ---------------------- RUNNER ----------------------
+
+def _applied_versions(cursor):
+    """Versiones ya aplicadas (None si schema_migrations todavía no existe)"""
+    cursor.execute("SELECT to_regclass('schema_migrations')")
+    if cursor.fetchone()[0] is None:
+        return None
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def pending_migrations():
+    """Pasos que faltan aplicar en la base actual"""
+    with get_pool().connection() as conn:
+        applied = _applied_versions(conn.cursor()) or set()
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+def run_migrations():
+    """Aplica los pasos pendientes en orden; devuelve las versiones aplicadas"""
+    applied_now = []
+
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+
+        # Camino rápido: una lectura y ningún lock si el esquema está al día
+        applied = _applied_versions(cursor)
+        conn.rollback()
+        if applied is not None and all(m.version in applied for m in MIGRATIONS):
+            print(f"✅ Esquema al día (versión {max(applied, default=0)})")
+            return applied_now
+
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+        conn.commit()
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.commit()
+
+            # Releer con el lock tomado: otro proceso pudo haber migrado mientras esperábamos
+            applied = _applied_versions(cursor)
+            for step in MIGRATIONS:
+                if step.version in applied:
+                    continue
+                print(f"🔄 Aplicando migración {step.version:03d}_{step.name}...")
+                try:
+                    step.apply(cursor)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (step.version, step.name)
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied_now.append(step.version)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+            conn.commit()
+
+    if applied_now:
+        print(f"✅ Migraciones aplicadas: {applied_now}")
+        # El esquema cambió: refrescar el registro de columnas
+        from schema_registry import schema_registry
+        schema_registry.refresh()
+    return applied_now
+
+
+if __name__ == "__main__":
+    try:
+        print("Iniciando migración de base de datos...")
+        run_migrations()
+        print("Migración completada exitosamente")
+    except Exception as e:
+        print(f"Error en migración: {e}")
+        sys.exit(1)
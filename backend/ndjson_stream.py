@@ -0,0 +1,91 @@
+"""
+Respuestas NDJSON (un objeto JSON por línea) para los listados grandes del admin.
+
+Con `Accept: application/x-ndjson` (o ?format=ndjson) el listado no se arma
+en memoria: se recorre un cursor con nombre (del lado del servidor) que trae
+`itersize` filas por viaje, y cada fila se codifica y se envía apenas se lee.
+La memoria queda plana sin importar el tamaño de la tabla.
+
+El stream usa su propia conexión del pool (la de la petición se devuelve
+antes de que empiece a enviarse el cuerpo) y la libera al terminar o si el
+cliente corta. Un error a mitad de camino agrega una última línea
+{"error": ...}, porque el status 200 ya se envió.
+"""
+import threading
+import uuid
+from flask import request, current_app
+from database import get_pool
+from json_provider import dumps_bytes
+from config import ADMIN_STREAM_ITERSIZE
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+_lock = threading.Lock()
+_counters = {
+    'streams': 0,
+    'active': 0,
+    'rows': 0,
+    'errors': 0,
+    'cancelled': 0,
+}
+
+
+def wants_ndjson():
+    """True si el cliente pidió NDJSON (Accept o ?format=ndjson)"""
+    if request.args.get('format', '').strip().lower() == 'ndjson':
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def _count(name, n=1):
+    with _lock:
+        _counters[name] += n
+
+
+def stream_rows(query, params, convert, cursor_factory=None, itersize=None):
+    """Generador de líneas NDJSON: convert(fila) por cada fila de `query`"""
+    _count('streams')
+    _count('active')
+    rows = 0
+    finished = False
+    try:
+        with get_pool().connection(cursor_factory=cursor_factory) as conn:
+            cursor = conn.cursor(name=f"ndjson_{uuid.uuid4().hex}")
+            cursor.itersize = itersize or ADMIN_STREAM_ITERSIZE
+            cursor.execute(query, params)
+            for row in cursor:
+                yield dumps_bytes(convert(row)) + b"\n"
+                rows += 1
+            cursor.close()
+            conn.rollback()
+        finished = True
+    except Exception as e:
+        _count('errors')
+        print(f"❌ Error en listado NDJSON tras {rows} filas: {e}")
+        finished = True
+        yield dumps_bytes({"error": str(e)}) + b"\n"
+    finally:
+        # GeneratorExit (el cliente cortó) no pasa por except: la conexión ya volvió al pool
+        if not finished:
+            _count('cancelled')
+        _count('rows', rows)
+        _count('active', -1)
+
+
+def ndjson_response(query, params, convert, cursor_factory=None):
+    """Respuesta en streaming de `query` (ver stream_rows)"""
+    response = current_app.response_class(
+        stream_rows(query, params, convert, cursor_factory=cursor_factory),
+        mimetype=NDJSON_MIMETYPE,
+    )
+    response.headers['Cache-Control'] = 'private, no-store'
+    # Que un proxy (nginx) no acumule el cuerpo antes de reenviarlo
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def get_stream_stats():
+    """Contadores de los listados NDJSON"""
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,70 @@
+"""
+Paginación por cursor (keyset) para los listados de productos.
+
+El cursor es opaco para el cliente: base64 de un JSON con el orden usado y
+los valores de la última fila entregada. La página siguiente se pide con
+?after=<next_cursor> y se resuelve con un WHERE sobre la clave de orden, sin
+OFFSET, así que cuesta lo mismo en la primera página que en la última.
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+from config import CATALOG_PAGE_SIZE, CATALOG_MAX_PAGE_SIZE
+
+# limit: filas por página; after: valores de la clave de orden de la última fila (o None)
+Page = namedtuple('Page', ['limit', 'sort', 'after'])
+
+
+class InvalidCursor(ValueError):
+    """Cursor o parámetros de paginación inválidos (responder 400)"""
+
+
+def encode_cursor(sort, values):
+    """Arma el cursor opaco para continuar después de `values`"""
+    raw = json.dumps({'s': sort, 'k': list(values)}, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Devuelve los valores guardados en el cursor (debe ser del mismo orden)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        values = tuple(data['k'])
+        cursor_sort = data['s']
+    except (ValueError, TypeError, KeyError, binascii.Error, UnicodeDecodeError):
+        raise InvalidCursor("Cursor inválido")
+    if cursor_sort != sort:
+        raise InvalidCursor("El cursor corresponde a otro orden")
+    return values
+
+
+def is_unpaginated(args):
+    """?all=1: forma anterior (arreglo completo, sin paginar)"""
+    return args.get('all', '').strip().lower() in ('1', 'true', 'yes')
+
+
+def parse_page(args, sort='id'):
+    """Lee ?limit= y ?after= (None si se pidió el listado completo con ?all=1)"""
+    if is_unpaginated(args):
+        return None
+    limit = args.get('limit', '').strip()
+    try:
+        limit = int(limit) if limit else CATALOG_PAGE_SIZE
+    except ValueError:
+        raise InvalidCursor("El parámetro 'limit' debe ser numérico")
+    if limit < 1:
+        raise InvalidCursor("El parámetro 'limit' debe ser mayor a 0")
+    limit = min(limit, CATALOG_MAX_PAGE_SIZE)
+
+    after = args.get('after', '').strip()
+    return Page(limit, sort, decode_cursor(after, sort) if after else None)
+
+
+def paginate(rows, page, key):
+    """Recorta la fila extra pedida (LIMIT n+1) y arma {items, next_cursor}"""
+    has_more = len(rows) > page.limit
+    items = rows[:page.limit]
+    next_cursor = encode_cursor(page.sort, key(items[-1])) if has_more and items else None
+    return {'items': items, 'next_cursor': next_cursor}
@@ -0,0 +1,157 @@
+"""
+Hash de contraseñas con bcrypt fuera del hilo de la petición.
+
+bcrypt corre en un pool acotado de BCRYPT_MAX_CONCURRENCY hilos. Si no hay
+lugar dentro de BCRYPT_QUEUE_TIMEOUT segundos se lanza PasswordHashingBusy
+(las rutas responden 429). Una ráfaga de logins o registros no acapara la
+CPU que usan el resto de las peticiones del worker.
+
+El costo (rounds) sale de BCRYPT_ROUNDS o, si es 0, de una calibración al
+arrancar: el mayor costo cuyo hash tarda a lo sumo BCRYPT_TARGET_MS, acotado
+a [BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS]. El piso por defecto es 12 (el costo
+de bcrypt.gensalt() que se usaba antes): en una máquina lenta la calibración
+no baja el costo, solo lo sube en una rápida. Los hashes con un costo menor
+al vigente se rehacen en el próximo login exitoso (needs_rehash).
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from config import (BCRYPT_ROUNDS, BCRYPT_TARGET_MS, BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS,
+                    BCRYPT_MAX_CONCURRENCY, BCRYPT_QUEUE_TIMEOUT)
+
+CALIBRATION_ROUNDS = 8  # costo de la medición (cada punto más duplica el tiempo)
+CALIBRATION_SAMPLES = 3
+
+
+class PasswordHashingBusy(Exception):
+    """Todos los hilos de bcrypt ocupados durante BCRYPT_QUEUE_TIMEOUT"""
+
+
+def is_bcrypt_hash(hashed):
+    return hashed.startswith('$2b$') or hashed.startswith('$2a$')
+
+
+def hash_rounds(hashed):
+    """Costo de un hash bcrypt ($2b$12$... -> 12)"""
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, max_workers=BCRYPT_MAX_CONCURRENCY, queue_timeout=BCRYPT_QUEUE_TIMEOUT):
+        self.max_workers = max(1, max_workers)
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._lock = threading.Lock()
+        self._rounds = BCRYPT_ROUNDS or None
+        self._calibration = None
+        self._counters = {
+            'hashes': 0,
+            'verifies': 0,
+            'rejected': 0,
+            'rehashes': 0,
+            'busy_ms': 0.0,
+            'peak_wait_ms': 0.0,
+        }
+
+    # ---------------------- COSTO ----------------------
+
+    def calibrate(self):
+        """Mide bcrypt en esta máquina y elige el costo para BCRYPT_TARGET_MS"""
+        password = b'calibracion-de-costo'
+        salt = bcrypt.gensalt(CALIBRATION_ROUNDS)
+        samples = []
+        for _ in range(CALIBRATION_SAMPLES):
+            start = time.perf_counter()
+            bcrypt.hashpw(password, salt)
+            samples.append((time.perf_counter() - start) * 1000)
+        base_ms = min(samples)
+        rounds = CALIBRATION_ROUNDS + int(math.floor(math.log2(BCRYPT_TARGET_MS / base_ms)))
+        rounds = max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, rounds))
+        estimated_ms = base_ms * 2 ** (rounds - CALIBRATION_ROUNDS)
+        with self._lock:
+            self._rounds = rounds
+            self._calibration = {
+                'target_ms': BCRYPT_TARGET_MS,
+                'base_rounds': CALIBRATION_ROUNDS,
+                'base_ms': round(base_ms, 2),
+                'estimated_ms': round(estimated_ms, 1),
+            }
+        print(f"✅ Costo de bcrypt calibrado: {rounds} (~{estimated_ms:.0f} ms por hash)")
+        return rounds
+
+    @property
+    def rounds(self):
+        """Costo vigente (calibra la primera vez si BCRYPT_ROUNDS=0)"""
+        with self._lock:
+            rounds = self._rounds
+        return rounds if rounds is not None else self.calibrate()
+
+    def needs_rehash(self, hashed):
+        """True si el hash bcrypt tiene un costo menor al vigente"""
+        current = hash_rounds(hashed)
+        return current is not None and current < self.rounds
+
+    # ---------------------- EJECUCIÓN ----------------------
+
+    def _run(self, func, *args):
+        """Corre `func` en el pool; PasswordHashingBusy si no hay lugar a tiempo"""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._counters['rejected'] += 1
+            raise PasswordHashingBusy("Demasiadas operaciones de contraseña en curso, reintentar en unos segundos")
+        waited = (time.perf_counter() - start) * 1000
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        result = future.result()
+        with self._lock:
+            self._counters['busy_ms'] += (time.perf_counter() - start) * 1000 - waited
+            self._counters['peak_wait_ms'] = max(self._counters['peak_wait_ms'], waited)
+        return result
+
+    def hash(self, password):
+        """Hash bcrypt con el costo vigente"""
+        salt = bcrypt.gensalt(self.rounds)
+        hashed = self._run(bcrypt.hashpw, password.encode('utf-8'), salt)
+        with self._lock:
+            self._counters['hashes'] += 1
+        return hashed.decode('utf-8')
+
+    def verify(self, password, hashed):
+        """Compara contra un hash bcrypt"""
+        result = self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+        with self._lock:
+            self._counters['verifies'] += 1
+        return result
+
+    def record_rehash(self):
+        with self._lock:
+            self._counters['rehashes'] += 1
+
+    def stats(self):
+        """Contadores del pool de bcrypt"""
+        with self._lock:
+            data = dict(self._counters)
+            data.update({
+                'rounds': self._rounds,
+                'calibration': self._calibration,
+                'max_workers': self.max_workers,
+                'queue_timeout': self.queue_timeout,
+            })
+        data['busy_ms'] = round(data['busy_ms'], 1)
+        data['peak_wait_ms'] = round(data['peak_wait_ms'], 1)
+        return data
+
+
+# Instancia global
+password_hasher = PasswordHasher()
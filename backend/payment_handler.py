@@ -3,6 +3,8 @@ import json
 from datetime import datetime
 from flask import jsonify, request
 from database import get_conn
+from catalog_cache import invalidate_catalog
+from products import get_products_by_ids
 
 # Importar MercadoPago solo si está disponible
 try:
@@ -33,31 +35,27 @@ class PaymentHandler:
             mp_items = []
             total_amount = 0
             
+            # Todos los productos del carrito en una sola consulta
+            products = get_products_by_ids([item['product_id'] for item in items], columns=('id', 'name', 'price'))
+            
             for item in items:
-                # Obtener información del producto desde la base de datos
-                with get_conn() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "SELECT name, price FROM productos WHERE id = %s",
-                        (item['product_id'],)
-                    )
-                    product = cursor.fetchone()
-                    
-                    if not product:
-                        return jsonify({"error": f"Producto {item['product_id']} no encontrado"}), 404
-                    
-                    product_name = product['name']
-                    product_price = float(product['price'])
-                    quantity = int(item['quantity'])
-                    item_total = product_price * quantity
-                    total_amount += item_total
-                    
-                    mp_items.append({
-                        "title": product_name,
-                        "quantity": quantity,
-                        "unit_price": product_price,
-                        "currency_id": "ARS"
-                    })
+                product = products.get(int(item['product_id']))
+                
+                if not product:
+                    return jsonify({"error": f"Producto {item['product_id']} no encontrado"}), 404
+                
+                product_name = product['name']
+                product_price = product['price']
+                quantity = int(item['quantity'])
+                item_total = product_price * quantity
+                total_amount += item_total
+                
+                mp_items.append({
+                    "title": product_name,
+                    "quantity": quantity,
+                    "unit_price": product_price,
+                    "currency_id": "ARS"
+                })
             
             # Crear preferencia de pago
             preference_data = {
@@ -145,16 +143,17 @@ class PaymentHandler:
                 result = cursor.fetchone()
                 order_id = result['id']
                 
+                # Precio y stock de todos los productos, bloqueados hasta el commit
+                products = get_products_by_ids(
+                    [item['product_id'] for item in items], columns=('id', 'price', 'stock'),
+                    cursor=cursor, for_update=True,
+                )
+                
                 # Insertar items del pedido
                 for item in items:
-                    # Obtener precio y stock del producto
-                    cursor.execute(
-                        "SELECT price, stock FROM productos WHERE id = %s",
-                        (item['product_id'],)
-                    )
-                    product = cursor.fetchone()
-                    product_price = float(product['price']) if product else 0
-                    current_stock = int(product['stock']) if product else 0
+                    product = products.get(int(item['product_id']))
+                    product_price = product['price'] if product else 0
+                    current_stock = product['stock'] if product else 0
                     
                     # Verificar stock disponible
                     if current_stock < item['quantity']:
@@ -166,6 +165,8 @@ class PaymentHandler:
                         "UPDATE productos SET stock = %s WHERE id = %s",
                         (new_stock, item['product_id'])
                     )
+                    if product:
+                        product['stock'] = new_stock  # el mismo producto puede repetirse en el carrito
                     
                     cursor.execute(
                         """
@@ -176,6 +177,7 @@ class PaymentHandler:
                     )
                 
                 conn.commit()
+                invalidate_catalog()  # Cambió el stock
                 return order_id, order_number, verification_code
                 
         except Exception as e:
@@ -391,17 +393,18 @@ def process_webhook(self, payload: dict, data_id: str = None):
                     print("ERROR - No se pudo obtener el order_id")
                     raise Exception("No se pudo obtener el ID del pedido")
                 
+                # Stock de todos los productos, bloqueados hasta el commit
+                products = get_products_by_ids(
+                    [item['product_id'] for item in items], columns=('id', 'stock'),
+                    cursor=cursor, for_update=True,
+                )
+                
                 # Insertar items del pedido
                 for item in items:
                     print(f"DEBUG - Insertando item: {item}")
                     
-                    # Obtener stock actual del producto
-                    cursor.execute(
-                        "SELECT stock FROM productos WHERE id = %s",
-                        (item['product_id'],)
-                    )
-                    product = cursor.fetchone()
-                    current_stock = int(product['stock']) if product else 0
+                    product = products.get(int(item['product_id']))
+                    current_stock = product['stock'] if product else 0
                     
                     # Verificar stock disponible
                     if current_stock < item['quantity']:
@@ -413,6 +416,8 @@ def process_webhook(self, payload: dict, data_id: str = None):
                         "UPDATE productos SET stock = %s WHERE id = %s",
                         (new_stock, item['product_id'])
                     )
+                    if product:
+                        product['stock'] = new_stock  # el mismo producto puede repetirse en el carrito
                     
                     cursor.execute(
                         """
@@ -423,6 +428,7 @@ def process_webhook(self, payload: dict, data_id: str = None):
                     )
                 
                 conn.commit()
+                invalidate_catalog()  # Cambió el stock
                 print(f"DEBUG - Pedido guardado exitosamente con ID: {order_id}")
                 return order_id, order_number, verification_code
                 
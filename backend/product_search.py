@@ -0,0 +1,71 @@
+"""
+Búsqueda de productos sobre las columnas generadas de la migración 12.
+
+- search_vector: tsvector (config es_unaccent = spanish + unaccent) de
+  name (peso A), brand (B) y category (C), con índice GIN.
+- search_text: texto en minúsculas y sin acentos, con índice GIN de trigramas
+  para subcadenas (como el LIKE anterior) y errores de tipeo (word_similarity).
+
+Si la base todavía no tiene esas columnas se usa el filtro LIKE de siempre.
+"""
+import html
+from schema_registry import schema_registry
+
+SEARCH_CONFIG = 'es_unaccent'
+HIGHLIGHTED_FIELDS = ('name', 'brand', 'category')
+
+# Marcas internas para ts_headline: el texto se escapa en Python y recién
+# después se convierten en <mark>, así un nombre con HTML no se inyecta
+_START = '\x02'
+_STOP = '\x03'
+_HEADLINE_OPTIONS = f'StartSel={_START}, StopSel={_STOP}, HighlightAll=true'
+
+
+def search_available():
+    """¿La base tiene las columnas de búsqueda?"""
+    return schema_registry.has_column('productos', 'search_vector')
+
+
+def search_predicate(q):
+    """Condición de búsqueda (servida por los índices GIN) y sus parámetros"""
+    if not search_available():
+        like = f"%{q}%"
+        return "(LOWER(name) LIKE %s OR LOWER(brand) LIKE %s OR LOWER(category) LIKE %s)", [like, like, like]
+    sql = (
+        f"(search_vector @@ websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        " OR search_text LIKE '%%' || lower(f_unaccent(%s)) || '%%'"
+        " OR lower(f_unaccent(%s)) <%% search_text)"
+    )
+    return sql, [q, q, q]
+
+
+def rank_expression(q):
+    """Relevancia: rango full-text + similitud de trigramas (numeric, estable para el cursor)"""
+    sql = (
+        f"round((ts_rank(search_vector, websearch_to_tsquery('{SEARCH_CONFIG}', %s))"
+        " + word_similarity(lower(f_unaccent(%s)), search_text))::numeric, 6)"
+    )
+    return sql, [q, q]
+
+
+def headline_columns(q):
+    """Columnas ts_headline de los campos resaltables, en el orden de HIGHLIGHTED_FIELDS"""
+    columns = []
+    params = []
+    for field in HIGHLIGHTED_FIELDS:
+        columns.append(
+            f"ts_headline('{SEARCH_CONFIG}', coalesce({field}, ''), "
+            f"websearch_to_tsquery('{SEARCH_CONFIG}', %s), %s)"
+        )
+        params.extend([q, _HEADLINE_OPTIONS])
+    return ", ".join(columns), params
+
+
+def build_highlight(headlines):
+    """{campo: html con <mark>} solo para los campos donde hubo coincidencia"""
+    highlight = {}
+    for field, text in zip(HIGHLIGHTED_FIELDS, headlines):
+        if text and _START in text:
+            escaped = html.escape(text, quote=False)
+            highlight[field] = escaped.replace(_START, '<mark>').replace(_STOP, '</mark>')
+    return highlight
@@ -0,0 +1,33 @@
+"""
+Lecturas de productos compartidas por el catálogo y el checkout.
+"""
+from database import get_conn
+from serializers import PRODUCT_COLUMNS, serialize_product
+
+
+def get_products_by_ids(ids, columns=PRODUCT_COLUMNS, cursor=None, for_update=False):
+    """
+    {id: producto} de todos los `ids` en una sola consulta (WHERE id = ANY).
+    Los ids que no existen no aparecen en el resultado.
+    Con `cursor` se usa esa transacción; con `for_update` las filas quedan
+    bloqueadas hasta el commit (para descontar stock), en orden de id.
+    """
+    ids = sorted({int(pid) for pid in ids})
+    if not ids:
+        return {}
+    columns = tuple(columns) if 'id' in columns else ('id',) + tuple(columns)
+    query = f"SELECT {', '.join(columns)} FROM productos WHERE id = ANY(%s) ORDER BY id"
+    if for_update:
+        query += " FOR UPDATE"
+
+    if cursor is None:
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (ids,))
+            rows = cursor.fetchall()
+    else:
+        cursor.execute(query, (ids,))
+        rows = cursor.fetchall()
+
+    products = (serialize_product(row, columns) for row in rows)
+    return {product['id']: product for product in products}
@@ -0,0 +1,191 @@
+"""
+Rate limiting por clave (ip + acción) con ventana deslizante aproximada.
+
+Cada clave guarda un estado de tamaño fijo: el inicio de la ventana actual y
+los conteos de la ventana actual y la anterior. La cantidad estimada es
+anterior * (fracción de la ventana anterior que sigue dentro) + actual. No se
+guarda un registro por intento, así que una IP insistente no crece en memoria.
+
+Backends (RATE_LIMIT_BACKEND):
+- memory: por proceso, acotado a RATE_LIMIT_MAX_KEYS claves (LRU). Las
+  claves inactivas se descartan al vencer (dos ventanas sin uso).
+- sqlite: un archivo (RATE_LIMIT_SQLITE_PATH) compartido por todos los
+  workers de la máquina. Cada intento se evalúa en una transacción
+  BEGIN IMMEDIATE y las filas vencidas se borran periódicamente.
+Si el backend falla se deja pasar (mejor no bloquear logins por un archivo).
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from config import RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_MAX_KEYS
+
+SWEEP_EVERY = 500  # intentos entre barridos de claves vencidas (sqlite)
+SQLITE_TIMEOUT = 2  # segundos esperando el lock del archivo
+
+
+def _slide(state, now, limit, window):
+    """(permitido, nuevo estado) a partir del estado (inicio, anterior, actual) de una clave"""
+    start = now - now % window
+    if state is None or state[0] < start - window:
+        previous, current = 0, 0
+    elif state[0] < start:
+        previous, current = state[2], 0
+    else:
+        previous, current = state[1], state[2]
+    estimated = previous * (1 - (now - start) / window) + current
+    if estimated >= limit:
+        return False, (start, previous, current)
+    return True, (start, previous, current + 1)
+
+
+class MemoryBackend:
+    """Contadores en memoria del proceso (LRU acotado con vencimiento)"""
+
+    name = 'memory'
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max(1, max_keys)
+        self._data = OrderedDict()  # clave -> (inicio, anterior, actual, vence)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def hit(self, key, limit, window, now):
+        with self._lock:
+            self._expire(now)
+            entry = self._data.get(key)
+            allowed, state = _slide(entry[:3] if entry else None, now, limit, window)
+            # Sin uso durante dos ventanas el estado ya no aporta nada
+            self._data[key] = state + (state[0] + 2 * window,)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return allowed
+
+    def _expire(self, now):
+        """Descarta desde el extremo menos usado mientras estén vencidas"""
+        while self._data:
+            key, entry = next(iter(self._data.items()))
+            if entry[3] > now:
+                break
+            del self._data[key]
+            self.evictions += 1
+
+    def size(self):
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteBackend:
+    """Contadores en un archivo SQLite compartido entre procesos"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=None):
+        self.path = path or RATE_LIMIT_SQLITE_PATH or os.path.join(tempfile.gettempdir(), 'whip_rate_limit.sqlite3')
+        self._local = threading.local()
+        self._hits = 0
+        self.evictions = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                window_start REAL NOT NULL,
+                previous INTEGER NOT NULL,
+                current INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limits_expires_at ON rate_limits (expires_at)")
+
+    def _conn(self):
+        """Una conexión por hilo (sqlite3 no comparte conexiones entre hilos)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def hit(self, key, limit, window, now):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT window_start, previous, current FROM rate_limits WHERE key = ?", (key,)
+            ).fetchone()
+            allowed, state = _slide(row, now, limit, window)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (key, window_start, previous, current, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, state[0], state[1], state[2], state[0] + 2 * window)
+            )
+            self._hits += 1
+            if self._hits % SWEEP_EVERY == 0:
+                self.evictions += conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,)).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def size(self):
+        return self._conn().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._actions = {}  # acción -> {'allowed', 'rejected'}
+        self._backend_errors = 0
+
+    def hit(self, key, action, limit, window):
+        """Registra un intento; False si `key` superó `limit` intentos en `window` segundos"""
+        try:
+            allowed = self.backend.hit(f"{key}_{action}", limit, window, time.time())
+        except Exception as e:
+            with self._lock:
+                self._backend_errors += 1
+            print(f"⚠️ Rate limit no disponible ({self.backend.name}): {e}")
+            allowed = True
+        with self._lock:
+            counters = self._actions.setdefault(action, {'allowed': 0, 'rejected': 0})
+            counters['allowed' if allowed else 'rejected'] += 1
+        return allowed
+
+    def stats(self):
+        """Intentos permitidos / rechazados por acción"""
+        with self._lock:
+            actions = {action: dict(counters) for action, counters in self._actions.items()}
+            errors = self._backend_errors
+        try:
+            keys = self.backend.size()
+        except Exception:
+            keys = None
+        return {
+            'backend': self.backend.name,
+            'keys': keys,
+            'evictions': self.backend.evictions,
+            'backend_errors': errors,
+            'actions': actions,
+        }
+
+
+def _create_backend():
+    if RATE_LIMIT_BACKEND == 'sqlite':
+        try:
+            backend = SQLiteBackend()
+            print(f"✅ Rate limiting compartido en {backend.path}")
+            return backend
+        except Exception as e:
+            print(f"⚠️ No se pudo abrir el rate limiting en SQLite ({e}), usando memoria")
+    return MemoryBackend()
+
+
+# Instancia global
+rate_limiter = RateLimiter(_create_backend())
@@ -0,0 +1,73 @@
+"""
+Registro de capacidades del esquema: columnas de las tablas principales,
+leídas de information_schema al iniciar y solo refrescadas tras una migración
+"""
+import threading
+from database import get_conn
+
+TRACKED_TABLES = ('productos', 'orders', 'users')
+
+
+class SchemaRegistry:
+    def __init__(self, tables=TRACKED_TABLES):
+        self.tables = tuple(tables)
+        self._columns = None  # {tabla: {columna: data_type}}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Vuelve a introspectar las tablas registradas (llamar después de migrar)"""
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT table_name, column_name, data_type
+                FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = ANY(%s)
+                """,
+                (list(self.tables),)
+            )
+            rows = cursor.fetchall()
+
+        columns = {table: {} for table in self.tables}
+        for row in rows:
+            columns[row['table_name']][row['column_name']] = row['data_type']
+
+        with self._lock:
+            self._columns = columns
+        print("✅ Esquema registrado: " + ", ".join(
+            f"{table}({len(cols)} columnas)" for table, cols in columns.items()
+        ))
+        return columns
+
+    @property
+    def loaded(self):
+        """¿Ya se introspectó el esquema?"""
+        return self._columns is not None
+
+    def _get(self):
+        columns = self._columns
+        if columns is None:
+            # Respaldo si init_db no llegó a cargar el registro
+            columns = self.refresh()
+        return columns
+
+    def has_column(self, table, column):
+        """¿Existe la columna? Se responde en memoria, sin ir a la base"""
+        return column in self._get().get(table, {})
+
+    def column_type(self, table, column):
+        """Tipo de la columna según information_schema (None si no existe)"""
+        return self._get().get(table, {}).get(column)
+
+    def columns(self, table):
+        """Conjunto de columnas conocidas de una tabla"""
+        return frozenset(self._get().get(table, {}))
+
+    def invalidate(self):
+        """Olvida lo cargado; la próxima consulta vuelve a introspectar"""
+        with self._lock:
+            self._columns = None
+
+
+# Instancia global
+schema_registry = SchemaRegistry()
@@ -0,0 +1,124 @@
+"""
+Serialización de filas de productos a diccionarios para la API.
+
+En lugar de revisar fila por fila qué columnas vienen y cómo convertirlas,
+se arma un serializador por cada forma de consulta (la tupla de columnas):
+los índices y los conversores de cada columna se resuelven una sola vez y
+por fila solo queda leer posiciones y aplicar funciones ya elegidas.
+"""
+import json
+from functools import lru_cache
+
+# Columnas de la representación completa de un producto (en orden)
+PRODUCT_COLUMNS = (
+    'id', 'name', 'brand', 'price', 'porcentaje_descuento', 'precio_efectivo',
+    'category', 'condition', 'sizes', 'stock', 'image', 'images', 'status',
+)
+
+
+def _to_sizes(value):
+    """text[] llega como lista; CSV si la base no está migrada"""
+    if isinstance(value, list):
+        return value
+    if value and isinstance(value, str):
+        return [s.strip() for s in value.split(',') if s.strip()]
+    return []
+
+
+def _to_images(value):
+    """jsonb llega como lista; JSON en texto si la base no está migrada"""
+    if isinstance(value, list):
+        return value
+    if value and isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return []
+    return []
+
+
+def _to_stock(value):
+    if type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _to_price(value):
+    if type(value) is float:
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError, ArithmeticError):
+        return 0.0
+
+
+def _to_percentage(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError, ArithmeticError):
+        return None
+
+
+# Expresión de cada columna con conversión, en función de `v` (el valor crudo)
+_INLINE = {
+    'sizes': "v if v.__class__ is list else _to_sizes(v)",
+    'images': "v if v.__class__ is list else _to_images(v)",
+    'stock': "v if v.__class__ is int else _to_stock(v)",
+    'price': "v if v.__class__ is float else _to_price(v)",
+    # Columna generada en la base (migración 14): solo se convierte
+    'precio_efectivo': "v if v.__class__ is float else _to_price(v)",
+    'porcentaje_descuento': "None if v is None else _to_percentage(v)",
+}
+_NAMESPACE = {
+    '_to_sizes': _to_sizes,
+    '_to_images': _to_images,
+    '_to_stock': _to_stock,
+    '_to_price': _to_price,
+    '_to_percentage': _to_percentage,
+}
+
+
+@lru_cache(maxsize=64)
+def compile_product_serializer(columns):
+    """
+    Serializador para filas (tuplas) con las columnas `columns`, en ese orden.
+    Devuelve fila -> dict con esas columnas convertidas para la API:
+    sizes/images como listas, stock entero, price y precio_efectivo float,
+    porcentaje_descuento float o None. Nada se calcula en Python.
+    Las columnas de más al final de la fila (rango, resaltados) se ignoran.
+
+    Se genera el código de una función con los índices ya resueltos, p. ej.
+    para (id, price): lambda row: {'id': row[0], 'price': <conv>(row[1]), ...}
+    """
+    columns = tuple(columns)
+    lines = ["def serialize(row):"]
+    items = []
+    for index, column in enumerate(columns):
+        if column in _INLINE:
+            lines.append(f"    v = row[{index}]")
+            lines.append(f"    c{index} = {_INLINE[column]}")
+            items.append(f"{column!r}: c{index}")
+        else:
+            items.append(f"{column!r}: row[{index}]")
+    lines.append("    return {" + ", ".join(items) + "}")
+
+    namespace = dict(_NAMESPACE)
+    exec(compile("\n".join(lines), f"<serializer {','.join(columns)}>", "exec"), namespace)
+    return namespace['serialize']
+
+
+def serialize_product(row, columns=None):
+    """Una fila suelta: tupla (con `columns`, por defecto PRODUCT_COLUMNS) o fila con nombres"""
+    if hasattr(row, '_asdict'):
+        row = row._asdict()
+    if isinstance(row, dict):
+        return compile_product_serializer(tuple(row))(tuple(row.values()))
+    columns = tuple(columns) if columns is not None else PRODUCT_COLUMNS
+    # Filas más cortas que `columns`: solo las columnas presentes
+    return compile_product_serializer(columns[:len(row)])(row)
+
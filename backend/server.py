@@ -3,9 +3,24 @@ from flask_cors import CORS
 from functools import wraps
 import os
 import re
-from database import get_conn, init_postgresql
+from database import get_conn, init_postgresql, mark_request_failed, commit_request_conn, release_request_conn
+from schema_registry import schema_registry
+from catalog_cache import catalog_cache, invalidate_catalog, get_catalog_version
+from catalog_snapshot import catalog_snapshot
+from werkzeug.http import is_resource_modified
+from pagination import parse_page, paginate, InvalidCursor
+from product_search import search_available, search_predicate, rank_expression, headline_columns, build_highlight
+from decimal import Decimal
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from serializers import serialize_product, compile_product_serializer
+from products import get_products_by_ids
+from bulk_products import FORMATS, InvalidImport, read_records, import_products, export_products
+from json_provider import install_json_provider
+from ndjson_stream import wants_ndjson, ndjson_response
 from datetime import datetime, timedelta
+import codecs
 import hashlib
+import math
 import secrets
 import hmac
 import time
@@ -13,10 +28,14 @@ import time
 
 # Importar el módulo de autenticación
 try:
-    from auth import auth_manager, require_auth, require_admin
+    from auth import auth_manager, require_auth, require_admin, USER_LIST_SQL, user_summary
+    from password_hashing import PasswordHashingBusy, password_hasher
     AUTH_AVAILABLE = True
 except ImportError:
     AUTH_AVAILABLE = False
+
+    class PasswordHashingBusy(Exception):
+        """Sin auth no hay bcrypt: nunca se lanza"""
     print("⚠️  Módulo de autenticación no disponible")
 
 # Procesamiento de imágenes deshabilitado
@@ -54,8 +73,8 @@ except ImportError:
 # Importar configuración
 from config import *
 
-# Diccionario para almacenar intentos de login (rate limiting básico)
-login_attempts = {}
+# Rate limiting por IP y acción (ventana deslizante, memoria o SQLite compartido)
+from rate_limit import rate_limiter
 
 def sanitize_input(text):
     """Sanitiza input del usuario"""
@@ -66,21 +85,8 @@ def sanitize_input(text):
     return text.strip()
 
 def check_rate_limit(ip, action, limit=5, window=300):
-    """Verifica rate limiting mejorado"""
-    now = datetime.now()
-    key = f"{ip}_{action}"
-    
-    if key not in login_attempts:
-        login_attempts[key] = []
-    
-    # Limpiar intentos antiguos
-    login_attempts[key] = [t for t in login_attempts[key] if now - t < timedelta(seconds=window)]
-    
-    if len(login_attempts[key]) >= limit:
-        return False
-    
-    login_attempts[key].append(now)
-    return True
+    """True si `ip` no superó `limit` intentos de `action` en los últimos `window` segundos"""
+    return rate_limiter.hit(ip, action, limit, window)
 
 def get_rate_limits():
     """Obtener límites de rate limiting según configuración"""
@@ -173,6 +179,7 @@ def require_csrf_file_upload(f):
     return decorated_function
 
 app = Flask(__name__)
+install_json_provider(app)
 app.config['DEBUG'] = os.environ.get('DEBUG', 'False').lower() == 'true'
 
 # Configurar SECRET_KEY para sesiones y CSRF
@@ -239,6 +246,24 @@ def add_security_headers(response):
     
     return response
 
+# ---------------------- Conexión a la base por petición ----------------------
+@app.after_request
+def finish_request_transaction(response):
+    """
+    Confirma la transacción compartida antes de responder. Las respuestas de
+    error (>= 400) la deshacen; si el COMMIT falla el cliente recibe un 500.
+    """
+    if response.status_code >= 400:
+        mark_request_failed()
+    elif not commit_request_conn():
+        return make_response(jsonify({"error": "No se pudieron guardar los cambios, reintentar"}), 500)
+    return response
+
+@app.teardown_request
+def release_db_connection(exc):
+    """Deshacer lo que no se confirmó y devolver la conexión compartida al pool"""
+    release_request_conn(exc)
+
 def generate_csp_policy():
     """Generar Content Security Policy según el entorno"""
     is_production = not app.config['DEBUG'] or os.environ.get('IS_PRODUCTION', 'False').lower() == 'true'
@@ -274,11 +299,9 @@ def generate_csp_policy():
 
 # ---------------------- Database helpers ----------------------
 def get_conn():
-    """Obtiene conexión a PostgreSQL"""
-    from database import get_connection_string
-    import psycopg2
-    conn = psycopg2.connect(get_connection_string())
-    return conn
+    """Obtiene conexión a PostgreSQL (dentro de una petición, la compartida de la petición)"""
+    from database import get_pooled_conn
+    return get_pooled_conn()
 
 def execute_query(conn, query, params=None):
     """Ejecuta una query en PostgreSQL"""
@@ -306,119 +329,53 @@ def init_db():
             cursor.execute("SELECT 1")
             print("✅ Conexión a PostgreSQL exitosa")
         
-        # Inicializar PostgreSQL
+        # Aplicar migraciones pendientes (sin DDL si el esquema está al día) y datos de ejemplo
         from database import init_postgresql
         init_postgresql()
         print("✅ PostgreSQL inicializado correctamente")
-        
-        # Ejecutar migración completa de base de datos
-        try:
-            print("🔄 Ejecutando migración de base de datos...")
-            from migrate_database import create_orders_table, create_order_items_table, add_verification_code_column
-            
-            create_orders_table()
-            create_order_items_table()
-            add_verification_code_column()
-            
-            print("✅ Migración de base de datos completada")
-                    
-        except Exception as e:
-            print(f"⚠️  Error en migración de base de datos: {e}")
-            # Intentar migración individual de verification_code como respaldo
-            try:
-                print("🔄 Intentando migración individual de verification_code...")
-                from database import get_conn
-                with get_conn() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        SELECT column_name
-                        FROM information_schema.columns
-                        WHERE table_name = 'orders' AND column_name = 'verification_code'
-                    """)
-                    if not cursor.fetchone():
-                        cursor.execute("ALTER TABLE orders ADD COLUMN verification_code VARCHAR(20)")
-                        cursor.execute("""
-                            UPDATE orders 
-                            SET verification_code = UPPER(SUBSTRING(MD5(order_number || EXTRACT(EPOCH FROM created_at)::text), 1, 8))
-                            WHERE verification_code IS NULL
-                        """)
-                        conn.commit()
-                        print("✅ Columna verification_code agregada como respaldo")
-            except Exception as backup_error:
-                print(f"⚠️  Error en migración de respaldo: {backup_error}")
-            # No fallar el inicio del servidor por esto
-            
+
+        # Introspectar el esquema una sola vez, ya migrado
+        if not schema_registry.loaded:
+            schema_registry.refresh()
+
+        # Escuchar cambios hechos por otros procesos para invalidar cachés
+        from change_feed import change_feed
+        change_feed.start()
+
+        # Snapshot estático del catálogo (se regenera tras cada cambio)
+        catalog_snapshot.start()
+
+        # Limpieza periódica de sesiones y tokens vencidos
+        from maintenance import maintenance
+        maintenance.start()
+
+        # Costo de bcrypt para esta máquina (antes de la primera petición de login)
+        if AUTH_AVAILABLE and not BCRYPT_ROUNDS:
+            password_hasher.calibrate()
+
+        # Tokens firmados (SESSION_TOKEN_MODE=signed): foto inicial de sesiones revocadas
+        from session_tokens import session_revocations
+        session_revocations.start()
+
     except Exception as e:
         print(f"❌ Error al inicializar PostgreSQL: {e}")
         raise e
 
             
-def row_to_dict(row):
-    """Convierte una fila de PostgreSQL a diccionario"""
-    # PostgreSQL - row es un RealDictRow
-    if hasattr(row, '_asdict'):
-        d = row._asdict()
-    else:
-        # Si no tiene _asdict, crear diccionario manualmente
-        d = {}
-        columns = ['id', 'name', 'brand', 'price', 'porcentaje_descuento', 'category', 'condition', 'sizes', 'stock', 'image', 'images', 'status']
-        for i, col in enumerate(columns):
-            if i < len(row):
-                d[col] = row[i]
-    
-    # sizes: CSV -> lista
-    if d.get("sizes") and isinstance(d["sizes"], str):
-        d["sizes"] = [s.strip() for s in d["sizes"].split(",") if s.strip()]
-    else:
-        d["sizes"] = []
-    
-    # images: JSON string -> lista
-    if d.get("images") and isinstance(d["images"], str):
-        try:
-            import json
-            d["images"] = json.loads(d["images"])
-        except Exception:
-            d["images"] = []
-    else:
-        d["images"] = []
-    
-    # price a 2 decimales
-    try:
-        d["price"] = float(d["price"])
-    except Exception:
-        d["price"] = 0.0
-    
-    # porcentaje_descuento a float (puede ser None)
-    if d.get("porcentaje_descuento") is not None:
-        try:
-            d["porcentaje_descuento"] = float(d["porcentaje_descuento"])
-            # Calcular precio_efectivo basado en el porcentaje
-            if d["porcentaje_descuento"] > 0:
-                descuento = d["price"] * (d["porcentaje_descuento"] / 100)
-                d["precio_efectivo"] = round(d["price"] - descuento, 2)
-            else:
-                d["precio_efectivo"] = d["price"]
-        except Exception:
-            d["porcentaje_descuento"] = None
-            d["precio_efectivo"] = d["price"]
-    else:
-        d["porcentaje_descuento"] = None
-        d["precio_efectivo"] = d["price"]
-    
-    # Si no existe precio_efectivo en la base de datos, calcularlo
-    if "precio_efectivo" not in d:
-        if d.get("porcentaje_descuento") and d["porcentaje_descuento"] > 0:
-            descuento = d["price"] * (d["porcentaje_descuento"] / 100)
-            d["precio_efectivo"] = round(d["price"] - descuento, 2)
-        else:
-            d["precio_efectivo"] = d["price"]
-    
-    # stock a entero
-    try:
-        d["stock"] = int(d["stock"])
-    except Exception:
-        d["stock"] = 0
-    return d
+def row_to_dict(row, columns=None):
+    """
+    Convierte una fila de PostgreSQL a diccionario. `columns` indica qué columnas
+    trae la fila (por defecto las 12 de siempre); solo se convierten las presentes.
+    Para muchas filas de la misma consulta conviene compile_product_serializer.
+    """
+    return serialize_product(row, columns)
+
+
+def password_busy_response(e):
+    """bcrypt saturado (todos los hilos ocupados): 429 para que el cliente reintente"""
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = str(max(1, round(BCRYPT_QUEUE_TIMEOUT)))
+    return response, 429
 
 
 # ---------------------- RUTAS PRINCIPALES ----------------------
@@ -428,6 +385,11 @@ def index():
     """Sirve la página principal"""
     return send_from_directory("..", "index.html")
 
+@app.route("/assets/catalog/<path:filename>")
+def serve_catalog_snapshot(filename):
+    """Snapshot del catálogo: manifiesto sin caché, catalog.<hash>.json inmutable (br/gzip precomprimidos)"""
+    return catalog_snapshot.send_static(filename)
+
 @app.route("/<path:filename>")
 def serve_static(filename):
     """Sirve archivos estáticos"""
@@ -747,44 +709,21 @@ Sitemap: {base_url}/sitemap.xml
 @app.route("/api/migrate/password-reset", methods=["POST"])
 @debug_only
 def migrate_password_reset():
-    """Ejecutar migración de password_reset_tokens"""
+    """Aplicar migraciones pendientes (incluye password_reset_tokens)"""
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        
-        # Leer el archivo SQL
-        with open('backend/migrate_password_reset.sql', 'r', encoding='utf-8') as f:
-            sql_content = f.read()
-        
-        # Ejecutar la migración
-        cursor.execute(sql_content)
-        conn.commit()
-        
-        # Verificar que la tabla se creó
-        cursor.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_name = 'password_reset_tokens'
-        """)
-        
-        if cursor.fetchone():
-            return jsonify({
-                "success": True,
-                "message": "Tabla 'password_reset_tokens' creada exitosamente"
-            }), 200
-        else:
-            return jsonify({
-                "success": False,
-                "message": "Error: Tabla no se creó"
-            }), 500
+        from migrations import run_migrations
+        applied = run_migrations()
+        return jsonify({
+            "success": True,
+            "message": f"{len(applied)} migraciones aplicadas" if applied else "El esquema ya está al día",
+            "applied": applied
+        }), 200
             
     except Exception as e:
         return jsonify({
             "success": False,
             "message": f"Error ejecutando migración: {str(e)}"
         }), 500
-    finally:
-        conn.close()
 
 
 @app.route("/api/auth/verify-email", methods=["POST"])
@@ -961,34 +900,6 @@ def forgot_password():
         try:
             cursor = conn.cursor()
             
-            # Crear tabla si no existe
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS password_reset_tokens (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    token VARCHAR(255) NOT NULL UNIQUE,
-                    email VARCHAR(255) NOT NULL,
-                    expires_at TIMESTAMP NOT NULL,
-                    used BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            """)
-            
-            # Crear índices si no existen
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_token 
-                ON password_reset_tokens(token)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_user_id 
-                ON password_reset_tokens(user_id)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_expires_at 
-                ON password_reset_tokens(expires_at)
-            """)
-            
             cursor.execute("""
                 SELECT id, username, email, nombre, apellido 
                 FROM users 
@@ -1097,20 +1008,6 @@ def reset_password():
         try:
             cursor = conn.cursor()
             
-            # Crear tabla si no existe
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS password_reset_tokens (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    token VARCHAR(255) NOT NULL UNIQUE,
-                    email VARCHAR(255) NOT NULL,
-                    expires_at TIMESTAMP NOT NULL,
-                    used BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            """)
-            
             cursor.execute("""
                 SELECT prt.id, prt.user_id, prt.email, prt.expires_at, prt.used,
                        u.username, u.nombre, u.apellido
@@ -1159,6 +1056,8 @@ def reset_password():
         finally:
             conn.close()
             
+    except PasswordHashingBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -1206,20 +1105,6 @@ def validate_reset_token():
         try:
             cursor = conn.cursor()
             
-            # Crear tabla si no existe
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS password_reset_tokens (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    token VARCHAR(255) NOT NULL UNIQUE,
-                    email VARCHAR(255) NOT NULL,
-                    expires_at TIMESTAMP NOT NULL,
-                    used BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            """)
-            
             cursor.execute("""
                 SELECT prt.expires_at, prt.used, u.username
                 FROM password_reset_tokens prt
@@ -1261,75 +1146,490 @@ def validate_reset_token():
 
 
 
+class InvalidFields(ValueError):
+    """Filtros, ?fields=, ?view= o ?ids= inválidos (responder 400)"""
+
+
+def parse_price(args, name):
+    """Precio de un filtro: número finito o None; InvalidFields si no lo es"""
+    raw = args.get(name, "").strip()
+    if not raw:
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        raise InvalidFields(f"'{name}' debe ser numérico")
+    if not math.isfinite(value):
+        raise InvalidFields(f"'{name}' debe ser numérico")
+    return value
+
+
+def parse_product_filters(args):
+    """Normaliza los filtros del catálogo a una tupla (sirve como clave de caché)"""
+    q = args.get("q", "").strip().lower()
+    brand = args.get("brand", "").strip().lower()
+    category = args.get("category", "").strip().lower()
+    status = args.get("status", "").strip().lower()
+    size = args.get("size", "").strip()  # talle exacto, como se guarda (S, M, Único...)
+    return (
+        q,
+        brand,
+        category,
+        status,
+        parse_price(args, "min_price"),
+        parse_price(args, "max_price"),
+        size,
+        parse_price(args, "min_effective_price"),
+        parse_price(args, "max_effective_price"),
+    )
+
+
+def build_product_filters(filters):
+    """Arma el WHERE (y sus parámetros) a partir de los filtros normalizados"""
+    q, brand, category, status, min_price, max_price, size, min_effective, max_effective = filters
+    where = " WHERE 1=1"
+    params = []
+
+    if q:
+        predicate, predicate_params = search_predicate(q)
+        where += " AND " + predicate
+        params.extend(predicate_params)
+
+    if brand:
+        where += " AND LOWER(brand) = %s"
+        params.append(brand)
+
+    if category:
+        where += " AND LOWER(category) = %s"
+        params.append(category)
+
+    if status:
+        where += " AND LOWER(status) = %s"
+        params.append(status)
+
+    if min_price is not None:
+        where += " AND price >= %s"
+        params.append(min_price)
+
+    if max_price is not None:
+        where += " AND price <= %s"
+        params.append(max_price)
+
+    if size:
+        # @> usa el índice GIN de sizes
+        where += " AND sizes @> ARRAY[%s]::text[]"
+        params.append(size)
+
+    # Precio con descuento: columna generada e indexada (migración 14)
+    if min_effective is not None:
+        where += " AND precio_efectivo >= %s"
+        params.append(min_effective)
+
+    if max_effective is not None:
+        where += " AND precio_efectivo <= %s"
+        params.append(max_effective)
+
+    return where, params
+
+
+NO_PRODUCT_FILTERS = ('', '', '', '', None, None, '', None, None)
+PRODUCT_SORTS = ("id", "relevance", "precio_efectivo")
+PRODUCT_ORDER_BY = {
+    "id": " ORDER BY id DESC",
+    "relevance": " ORDER BY search_rank DESC, id DESC",
+    # Índice (precio_efectivo, id)
+    "precio_efectivo": " ORDER BY precio_efectivo, id",
+}
+
+# Campos de producto que se pueden pedir con ?fields= y la expresión SQL de cada uno
+PRODUCT_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "brand": "brand",
+    "price": "price",
+    "porcentaje_descuento": "porcentaje_descuento",
+    "precio_efectivo": "precio_efectivo",
+    "category": "category",
+    "condition": "condition",
+    "sizes": "sizes",
+    "stock": "stock",
+    "image": "image",
+    "images": "images",
+    "status": "status",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+PRODUCT_VIEWS = {
+    "card": ("id", "name", "price", "precio_efectivo", "image"),
+}
+
+
+def parse_product_fields(args):
+    """
+    ?fields=id,name,price o ?view=card -> tupla de campos pedidos
+    (None = representación completa, como hasta ahora)
+    """
+    view = args.get("view", "").strip().lower()
+    raw = args.get("fields", "").strip()
+    if view:
+        if view not in PRODUCT_VIEWS:
+            raise InvalidFields(f"Vista no soportada: {view}")
+        fields = list(PRODUCT_VIEWS[view])
+    elif raw:
+        fields = []
+        for field in raw.split(","):
+            field = field.strip()
+            if not field:
+                continue
+            if field not in PRODUCT_FIELDS:
+                raise InvalidFields(f"Campo desconocido: {field}")
+            if field not in fields:
+                fields.append(field)
+    else:
+        return None
+    # El id siempre va: lo necesitan el cursor y el frontend
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return tuple(fields)
+
+
+def parse_product_ids(args):
+    """?ids=1,5,9 -> tupla de ids sin repetir, en el orden pedido (None si no vino)"""
+    raw = args.get("ids", "").strip()
+    if not raw:
+        return None
+    ids = []
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            pid = int(part)
+        except ValueError:
+            raise InvalidFields(f"Id de producto inválido: {part}")
+        if pid not in ids:
+            ids.append(pid)
+    if len(ids) > CATALOG_MAX_PAGE_SIZE:
+        raise InvalidFields(f"Se pueden pedir hasta {CATALOG_MAX_PAGE_SIZE} productos por vez")
+    return tuple(ids)
+
+
+def load_products_by_ids(ids, fields=None):
+    """Productos pedidos por id (una sola consulta), en el orden de `ids`; los inexistentes se omiten"""
+    products = get_products_by_ids(ids, columns=product_columns(fields))
+    result = []
+    for pid in ids:
+        product = products.get(pid)
+        if product is None:
+            continue
+        if fields is not None:
+            product = {field: product[field] for field in fields if field in product}
+        result.append(product)
+    return result
+
+
+def product_columns(fields):
+    """Columnas a leer de la base para los campos pedidos (en el orden de PRODUCT_FIELDS)"""
+    if fields is None:
+        # Representación completa: la de siempre (created_at/updated_at solo si se piden)
+        return [column for column in PRODUCT_FIELDS if column not in ("created_at", "updated_at")]
+    return [column for column in PRODUCT_FIELDS if column in fields]
+
+
+def parse_product_sort(args, filters):
+    """
+    ?sort=id (por defecto, más nuevos primero), ?sort=relevance (requiere ?q=)
+    o ?sort=precio_efectivo (más baratos primero)
+    """
+    sort = args.get("sort", "").strip().lower() or "id"
+    if sort not in PRODUCT_SORTS:
+        raise InvalidCursor(f"Orden no soportado: {sort}")
+    # Sin texto de búsqueda (o sin columnas de búsqueda) no hay relevancia que ordenar
+    if sort == "relevance" and not (filters[0] and search_available()):
+        sort = "id"
+    return sort
+
+
+def load_products(filters, page=None, sort="id", fields=None):
+    """
+    Consulta el catálogo en la base (sin caché). Sin `page` devuelve el arreglo
+    completo; con `page` devuelve {items, next_cursor} (keyset sobre el orden pedido).
+    Con ?q= cada producto trae además `relevance` y `highlight`.
+    Con `fields` solo se leen (y devuelven) esos campos.
+    """
+    q = filters[0]
+    searching = bool(q) and search_available()
+    where, where_params = build_product_filters(filters)
+    columns = product_columns(fields)
+    if sort == "precio_efectivo" and "precio_efectivo" not in columns:
+        # La clave del cursor se lee de la fila aunque no se haya pedido el campo
+        columns.append("precio_efectivo")
+
+    query = "SELECT " + ", ".join(PRODUCT_FIELDS[column] for column in columns)
+    params = []
+    if searching:
+        rank_sql, params = rank_expression(q)
+        query += f", {rank_sql} AS search_rank"
+    query += " FROM productos" + where
+    params.extend(where_params)
+
+    if page and page.after:
+        try:
+            if sort == "id":
+                after = [int(page.after[0])]
+            else:
+                after = [Decimal(str(page.after[0])), int(page.after[1])]
+        except (TypeError, ValueError, IndexError, ArithmeticError):
+            raise InvalidCursor("Cursor inválido")
+        if sort == "relevance":
+            query = f"SELECT * FROM ({query}) r WHERE (search_rank, id) < (%s, %s)"
+        elif sort == "precio_efectivo":
+            query += " AND (precio_efectivo, id) > (%s, %s)"
+        else:
+            query += " AND id < %s"
+        params.extend(after)
+
+    order = PRODUCT_ORDER_BY[sort]
+    query += order
+    if page:
+        # Una fila de más para saber si hay página siguiente
+        query += " LIMIT %s"
+        params.append(page.limit + 1)
+
+    if searching:
+        # Resaltado solo sobre las filas ya recortadas
+        headline_sql, headline_params = headline_columns(q)
+        query = f"SELECT p.*, {headline_sql} FROM ({query}) p" + order
+        params = headline_params + params
+
+    print(f"DEBUG: Query: {query}")
+    print(f"DEBUG: Params: {params}")
+
+    conn = get_conn()
+    try:
+        rows = execute_query(conn, query, params).fetchall()
+    finally:
+        conn.close()
+    print(f"DEBUG: Rows found: {len(rows)}")
+
+    result = None
+    if page:
+        # El cursor sale de la fila cruda: clave de orden + id
+        id_index = columns.index("id")
+        if sort == "relevance":
+            sort_index = len(columns)
+        elif sort == "precio_efectivo":
+            sort_index = columns.index("precio_efectivo")
+        if sort == "id":
+            key = lambda r: (r[id_index],)
+        else:
+            key = lambda r: (r[sort_index], r[id_index])
+        result = paginate(rows, page, key=key)
+        rows = result["items"]
+
+    products = []
+    serialize = compile_product_serializer(tuple(columns))
+    extra = len(columns)  # después de las columnas pedidas: rango y resaltados
+    for r in rows:
+        product = serialize(r)
+        if fields is not None:
+            product = {field: product[field] for field in fields if field in product}
+        if searching:
+            product["relevance"] = float(r[extra])
+            product["highlight"] = build_highlight(r[extra + 1:])
+        products.append(product)
+    if result is not None:
+        result["items"] = products
+        return result
+    return products
+
+
+def catalog_conditional_response(key, build, private=False):
+    """
+    Respuesta condicional según la versión del catálogo: si el cliente ya tiene
+    esta versión (If-None-Match / If-Modified-Since) devuelve 304 sin consultar
+    ni serializar; si no, arma la respuesta con `build()` y le agrega ETag y
+    Last-Modified.
+    """
+    version, last_modified = get_catalog_version()
+    etag = hashlib.sha1(f"{version}|{request.path}|{key!r}".encode()).hexdigest()
+
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = make_response("", 304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Siempre revalidar: el catálogo puede cambiar en cualquier momento
+    response.headers["Cache-Control"] = "private, no-cache" if private else "no-cache"
+    return response
+
+
 @app.route("/api/products", methods=["GET"])
 def list_products():
     """
     Opcional: filtros por querystring
-    ?q=texto&brand=Fox&category=Cascos&status=Activo&min_price=0&max_price=1000000
+    ?q=texto&brand=Fox&category=Cascos&status=Activo&min_price=0&max_price=1000000&size=M
+    ?min_effective_price=&max_effective_price= filtran por el precio con descuento
+    ?sort=relevance ordena por relevancia de la búsqueda (?q=); ?sort=precio_efectivo, más baratos primero
+    ?fields=id,name,price o ?view=card (id, name, price, precio_efectivo, image) para traer solo esos campos
+    Paginado por cursor: ?limit=50&after=<next_cursor> -> {"items": [...], "next_cursor": ...}
+    ?all=1 devuelve el arreglo completo (forma anterior); sin filtros se sirve el snapshot estático
+    ?ids=1,5,9 devuelve esos productos (arreglo, en ese orden) para revalidar carrito/checkout
     """
     try:
-        q = request.args.get("q", "").strip()
-        brand = request.args.get("brand", "").strip()
-        category = request.args.get("category", "").strip()
-        status = request.args.get("status", "").strip()
-        min_price = request.args.get("min_price", "").strip()
-        max_price = request.args.get("max_price", "").strip()
+        ids = parse_product_ids(request.args)
+        if ids is not None:
+            fields = parse_product_fields(request.args)
+            key = ("ids", ids, fields)
+            return catalog_conditional_response(
+                key,
+                lambda: (jsonify(catalog_cache.get_or_load(key, lambda: load_products_by_ids(ids, fields))), 200)
+            )
 
-        query = "SELECT id, name, brand, price, COALESCE(porcentaje_descuento, NULL) as porcentaje_descuento, category, condition, sizes, stock, image, images, status, created_at, updated_at FROM productos WHERE 1=1"
-        params = []
+        filters = parse_product_filters(request.args)
+        sort = parse_product_sort(request.args, filters)
+        page = parse_page(request.args, sort=sort)
+        fields = parse_product_fields(request.args)
+        if page is None and filters == NO_PRODUCT_FILTERS and sort == "id" and fields is None:
+            # Catálogo completo: los bytes ya generados (None si el snapshot no está al día)
+            response = catalog_snapshot.response()
+            if response is not None:
+                return response
+        key = (filters, sort, page, fields)
+        return catalog_conditional_response(
+            key,
+            lambda: (jsonify(catalog_cache.get_or_load(key, lambda: load_products(filters, page, sort, fields))), 200)
+        )
 
-        if q:
-            query += " AND (LOWER(name) LIKE %s OR LOWER(brand) LIKE %s OR LOWER(category) LIKE %s)"
-            like = f"%{q.lower()}%"
-            params.extend([like, like, like])
+    except (InvalidCursor, InvalidFields) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"ERROR in list_products: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
 
-        if brand:
-            query += " AND LOWER(brand) = %s"
-            params.append(brand.lower())
 
-        if category:
-            query += " AND LOWER(category) = %s"
-            params.append(category.lower())
+PRICE_HISTOGRAM_BUCKETS = 10
 
-        if status:
-            query += " AND LOWER(status) = %s"
-            params.append(status.lower())
+# Bits de GROUPING(brand, category, size, status, bucket): 0 = columna agrupada
+FACET_GROUPS = {
+    0b01111: "brands",
+    0b10111: "categories",
+    0b11011: "sizes",
+    0b11101: "statuses",
+    0b11110: "price_buckets",
+    0b11111: "total",
+}
 
-        if min_price:
-            query += " AND price >= %s"
-            params.append(float(min_price))
 
-        if max_price:
-            query += " AND price <= %s"
-            params.append(float(max_price))
+def load_product_facets(filters):
+    """
+    Conteos por marca, categoría, talle y estado más histograma de precios,
+    todo en una sola consulta con GROUPING SETS sobre los productos filtrados.
+    """
+    where, params = build_product_filters(filters)
+    query = f"""
+        WITH base AS (
+            SELECT id, brand, category, status, sizes, price FROM productos{where}
+        ),
+        bounds AS (
+            SELECT MIN(price) AS min_price, MAX(price) AS max_price FROM base
+        ),
+        exploded AS (
+            SELECT b.id, b.brand, b.category, b.status, b.price, NULLIF(TRIM(s.size), '') AS size,
+                   CASE WHEN bounds.max_price > bounds.min_price
+                        THEN LEAST(width_bucket(b.price, bounds.min_price, bounds.max_price, %s), %s)
+                        ELSE 1 END AS bucket
+            FROM base b
+            CROSS JOIN bounds
+            LEFT JOIN LATERAL unnest(b.sizes) AS s(size) ON TRUE
+        )
+        SELECT GROUPING(brand, category, size, status, bucket) AS grp,
+               brand, category, size, status, bucket,
+               COUNT(DISTINCT id) AS total, MIN(price) AS min_price, MAX(price) AS max_price
+        FROM exploded
+        GROUP BY GROUPING SETS ((brand), (category), (size), (status), (bucket), ())
+    """
+    params = params + [PRICE_HISTOGRAM_BUCKETS, PRICE_HISTOGRAM_BUCKETS]
 
-        query += " ORDER BY id DESC"
+    conn = get_conn()
+    try:
+        rows = execute_query(conn, query, params).fetchall()
+    finally:
+        conn.close()
 
-        print(f"DEBUG: Query: {query}")
-        print(f"DEBUG: Params: {params}")
+    facets = {"total": 0, "brands": [], "categories": [], "sizes": [], "statuses": [],
+              "price": {"min": None, "max": None, "histogram": []}}
+    bucket_counts = {}
+    for grp, brand, category, size, status, bucket, total, min_price, max_price in rows:
+        group = FACET_GROUPS.get(grp)
+        if group == "total":
+            facets["total"] = total
+            facets["price"]["min"] = float(min_price) if min_price is not None else None
+            facets["price"]["max"] = float(max_price) if max_price is not None else None
+        elif group == "price_buckets":
+            if bucket is not None:
+                bucket_counts[bucket] = total
+        elif group:
+            value = {"brands": brand, "categories": category, "sizes": size, "statuses": status}[group]
+            if value is not None:
+                facets[group].append({"value": value, "count": total})
+
+    for group in ("brands", "categories", "sizes", "statuses"):
+        facets[group].sort(key=lambda f: (-f["count"], str(f["value"]).lower()))
+
+    # Histograma con rangos de igual ancho (incluye los vacíos)
+    low, high = facets["price"]["min"], facets["price"]["max"]
+    if low is not None:
+        buckets = PRICE_HISTOGRAM_BUCKETS if high > low else 1
+        width = (high - low) / buckets
+        facets["price"]["histogram"] = [
+            {
+                "from": round(low + width * i, 2),
+                "to": round(low + width * (i + 1), 2) if i < buckets - 1 else high,
+                "count": bucket_counts.get(i + 1, 0),
+            }
+            for i in range(buckets)
+        ]
+    return facets
 
-        conn = get_conn()
-        try:
-            rows = execute_query(conn, query, params).fetchall()
-            print(f"DEBUG: Rows found: {len(rows)}")
-            result = [row_to_dict(r) for r in rows]
-            print(f"DEBUG: Result length: {len(result)}")
-            return jsonify(result), 200
-        finally:
-            conn.close()
-        
+
+@app.route("/api/products/facets", methods=["GET"])
+def list_product_facets():
+    """
+    Facetas del catálogo para los filtros de la tienda (mismos filtros que /api/products):
+    conteos por marca, categoría, talle y estado, y rango/histograma de precios
+    """
+    try:
+        filters = parse_product_filters(request.args)
+        key = ("facets", filters)
+        return catalog_conditional_response(
+            key,
+            lambda: (jsonify(catalog_cache.get_or_load(key, lambda: load_product_facets(filters))), 200)
+        )
+    except InvalidFields as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"ERROR in list_products: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"ERROR in list_product_facets: {e}")
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/api/products/<int:pid>", methods=["GET"])
 def get_product(pid: int):
+    return catalog_conditional_response(pid, lambda: load_product(pid))
+
+
+def load_product(pid):
+    """Producto individual desde la base"""
     conn = get_conn()
     try:
-        row = execute_query(conn, "SELECT id, name, brand, price, COALESCE(porcentaje_descuento, NULL) as porcentaje_descuento, category, condition, sizes, stock, image, images, status, created_at, updated_at FROM productos WHERE id = %s", (pid,)).fetchone()
+        row = execute_query(conn, "SELECT id, name, brand, price, porcentaje_descuento, precio_efectivo, category, condition, sizes, stock, image, images, status, created_at, updated_at FROM productos WHERE id = %s", (pid,)).fetchone()
         if not row:
             return jsonify({"error": "Producto no encontrado"}), 404
         return jsonify(row_to_dict(row)), 200
@@ -1345,7 +1645,6 @@ def create_product():
     # Validaciones mínimas
     name = (data.get("name") or "").strip()
     price = data.get("price", 0)
-    precio_efectivo = data.get("precio_efectivo")
     porcentaje_descuento = data.get("porcentaje_descuento")
     if not name:
         return jsonify({"error": "El campo 'name' es obligatorio"}), 400
@@ -1354,14 +1653,7 @@ def create_product():
     except Exception:
         return jsonify({"error": "El campo 'price' debe ser numérico"}), 400
     
-    # Validar precio_efectivo si se proporciona
-    if precio_efectivo is not None:
-        try:
-            precio_efectivo = float(precio_efectivo)
-            if precio_efectivo < 0:
-                return jsonify({"error": "El precio efectivo debe ser mayor o igual a 0"}), 400
-        except Exception:
-            return jsonify({"error": "El campo 'precio_efectivo' debe ser numérico"}), 400
+    # precio_efectivo no se recibe: la base lo calcula de price y porcentaje_descuento
     
     # Validar porcentaje_descuento si se proporciona
     if porcentaje_descuento is not None:
@@ -1379,7 +1671,6 @@ def create_product():
     if isinstance(sizes_list, str):
         # Permitimos recibir CSV también
         sizes_list = [s.strip() for s in sizes_list.split(",") if s.strip()]
-    sizes_csv = ",".join(sizes_list)
     stock = data.get("stock", 0)
     try:
         stock = int(stock)
@@ -1399,57 +1690,34 @@ def create_product():
     elif not isinstance(images_list, list):
         images_list = []
     
-    # Convertir a JSON string para almacenar en la base de datos
-    import json
-    images_json = json.dumps(images_list)
+    # Se guarda como jsonb
+    images_json = Json(images_list)
     
     status = (data.get("status") or "Activo").strip() or "Activo"
 
     conn = get_conn()
     try:
-        # Verificar si la columna precio_efectivo existe
-        try:
-            cursor_check = conn.cursor()
-            cursor_check.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'productos' AND column_name = 'precio_efectivo'
-            """)
-            precio_efectivo_exists = cursor_check.fetchone() is not None
-        except Exception:
-            precio_efectivo_exists = False
-        
         cursor = conn.cursor()
-        
-        if precio_efectivo_exists:
-            cursor.execute(
-                """
-                INSERT INTO productos (name, brand, price, precio_efectivo, porcentaje_descuento, category, condition, sizes, stock, image, images, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-                """,
-                (name, brand, price, precio_efectivo, porcentaje_descuento, category, condition, sizes_csv, stock, image, images_json, status),
-            )
-        else:
-            cursor.execute(
-                """
-                INSERT INTO productos (name, brand, price, porcentaje_descuento, category, condition, sizes, stock, image, images, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-                """,
-                (name, brand, price, porcentaje_descuento, category, condition, sizes_csv, stock, image, images_json, status),
-            )
+        cursor.execute(
+            """
+            INSERT INTO productos (name, brand, price, porcentaje_descuento, category, condition, sizes, stock, image, images, status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+            """,
+            (name, brand, price, porcentaje_descuento, category, condition, sizes_list, stock, image, images_json, status),
+        )
         
         # PostgreSQL: obtener el ID del último insert
         result = cursor.fetchone()
         new_id = result[0]  # Acceder por índice en lugar de por clave
         conn.commit()  # Confirmar la transacción
+        invalidate_catalog()
 
-        cursor.execute("SELECT id, name, brand, price, COALESCE(porcentaje_descuento, NULL) as porcentaje_descuento, category, condition, sizes, stock, image, images, status, created_at, updated_at FROM productos WHERE id = %s", (new_id,))
+        cursor.execute("SELECT id, name, brand, price, porcentaje_descuento, precio_efectivo, category, condition, sizes, stock, image, images, status, created_at, updated_at FROM productos WHERE id = %s", (new_id,))
         row = cursor.fetchone()
         
         # Convertir a diccionario manualmente
-        columns = ['id', 'name', 'brand', 'price', 'porcentaje_descuento', 'category', 'condition', 'sizes', 'stock', 'image', 'images', 'status', 'created_at', 'updated_at']
+        columns = ['id', 'name', 'brand', 'price', 'porcentaje_descuento', 'precio_efectivo', 'category', 'condition', 'sizes', 'stock', 'image', 'images', 'status', 'created_at', 'updated_at']
         row_dict = {}
         for i, col in enumerate(columns):
             if i < len(row):
@@ -1460,139 +1728,108 @@ def create_product():
         conn.close()
 
 
-@app.route("/api/products/<int:pid>", methods=["PUT", "PATCH"])
-@require_admin
-def update_product(pid: int):
-    try:
-        data = request.get_json(force=True) or {}
-        print(f"DEBUG: Actualizando producto {pid} con datos: {data}")
+class InvalidProductUpdate(ValueError):
+    """Datos de actualización de producto inválidos (responder 400)"""
 
-        fields = []
-        params = []
 
-        def set_field(key, value):
-            fields.append(f"{key} = %s")
-            params.append(value)
-            print(f"DEBUG: Campo {key} = {value}")
+def parse_product_update(data):
+    """
+    Valida un cambio parcial de producto y devuelve {columna: valor}.
+    Mismas reglas para PUT /api/products/<id> y PATCH /api/admin/products.
+    """
+    updates = {}
+
+    # Campos opcionales
+    if "name" in data:
+        name = (data.get("name") or "").strip()
+        if not name:
+            raise InvalidProductUpdate("El campo 'name' no puede estar vacío")
+        updates["name"] = name
+
+    if "brand" in data:
+        updates["brand"] = (data.get("brand") or "").strip()
 
-        # Campos opcionales
-        if "name" in data:
-            name = (data.get("name") or "").strip()
-            if not name:
-                return jsonify({"error": "El campo 'name' no puede estar vacío"}), 400
-            set_field("name", name)
+    if "price" in data:
+        try:
+            updates["price"] = float(data.get("price"))
+        except Exception:
+            raise InvalidProductUpdate("El campo 'price' debe ser numérico")
 
-        if "brand" in data:
-            set_field("brand", (data.get("brand") or "").strip())
+    # precio_efectivo es una columna generada: se ignora si viene en el body
 
-        if "price" in data:
+    if "porcentaje_descuento" in data:
+        porcentaje_descuento = data.get("porcentaje_descuento")
+        if porcentaje_descuento == "":
+            porcentaje_descuento = None
+        if porcentaje_descuento is not None:
             try:
-                price = float(data.get("price"))
+                porcentaje_descuento = float(porcentaje_descuento)
             except Exception:
-                return jsonify({"error": "El campo 'price' debe ser numérico"}), 400
-            set_field("price", price)
+                raise InvalidProductUpdate("El campo 'porcentaje_descuento' debe ser numérico")
+            if porcentaje_descuento < 0 or porcentaje_descuento > 100:
+                raise InvalidProductUpdate("El porcentaje de descuento debe estar entre 0 y 100")
+        # Verificar si la columna existe antes de intentar actualizarla
+        if schema_registry.has_column('productos', 'porcentaje_descuento'):
+            updates["porcentaje_descuento"] = porcentaje_descuento
+        else:
+            print(f"WARNING: Columna porcentaje_descuento no existe, saltando actualización")
 
-        if "precio_efectivo" in data:
-            precio_efectivo = data.get("precio_efectivo")
-            if precio_efectivo is not None and precio_efectivo != "":
-                try:
-                    precio_efectivo = float(precio_efectivo)
-                    if precio_efectivo < 0:
-                        return jsonify({"error": "El precio efectivo debe ser mayor o igual a 0"}), 400
-                except Exception:
-                    return jsonify({"error": "El campo 'precio_efectivo' debe ser numérico"}), 400
-            # Verificar si la columna existe antes de intentar actualizarla
-            try:
-                cursor_check = conn.cursor()
-                cursor_check.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'productos' AND column_name = 'precio_efectivo'
-                """)
-                column_exists = cursor_check.fetchone() is not None
-                if column_exists:
-                    set_field("precio_efectivo", precio_efectivo)
-                else:
-                    print(f"WARNING: Columna precio_efectivo no existe, saltando actualización")
-            except Exception as e:
-                print(f"WARNING: Error verificando columna precio_efectivo: {e}")
-                # Si no podemos verificar, no intentar actualizar
-                print(f"WARNING: No se puede verificar la columna precio_efectivo, saltando actualización")
+    if "category" in data:
+        updates["category"] = (data.get("category") or "").strip()
 
-        if "porcentaje_descuento" in data:
-            porcentaje_descuento = data.get("porcentaje_descuento")
-            if porcentaje_descuento is not None and porcentaje_descuento != "":
-                try:
-                    porcentaje_descuento = float(porcentaje_descuento)
-                    if porcentaje_descuento < 0 or porcentaje_descuento > 100:
-                        return jsonify({"error": "El porcentaje de descuento debe estar entre 0 y 100"}), 400
-                except Exception:
-                    return jsonify({"error": "El campo 'porcentaje_descuento' debe ser numérico"}), 400
-            # Verificar si la columna existe antes de intentar actualizarla
-            try:
-                conn_check = get_conn()
-                try:
-                    cursor_check = conn_check.cursor()
-                    cursor_check.execute("""
-                        SELECT column_name 
-                        FROM information_schema.columns 
-                        WHERE table_name = 'productos' AND column_name = 'porcentaje_descuento'
-                    """)
-                    column_exists = cursor_check.fetchone() is not None
-                    if column_exists:
-                        set_field("porcentaje_descuento", porcentaje_descuento)
-                    else:
-                        print(f"WARNING: Columna porcentaje_descuento no existe, saltando actualización")
-                finally:
-                    conn_check.close()
-            except Exception as e:
-                print(f"WARNING: Error verificando columna porcentaje_descuento: {e}")
-                # Si no podemos verificar, intentar de todas formas
-                set_field("porcentaje_descuento", porcentaje_descuento)
+    if "sizes" in data:
+        sizes_list = data.get("sizes") or []
+        if isinstance(sizes_list, str):
+            sizes_list = [s.strip() for s in sizes_list.split(",") if s.strip()]
+        updates["sizes"] = sizes_list
 
-        if "category" in data:
-            set_field("category", (data.get("category") or "").strip())
+    if "stock" in data:
+        try:
+            updates["stock"] = int(data.get("stock"))
+        except Exception:
+            raise InvalidProductUpdate("El campo 'stock' debe ser numérico")
 
-        if "sizes" in data:
-            sizes_list = data.get("sizes") or []
-            if isinstance(sizes_list, str):
-                sizes_list = [s.strip() for s in sizes_list.split(",") if s.strip()]
-            set_field("sizes", ",".join(sizes_list))
+    if "image" in data:
+        updates["image"] = (data.get("image") or "").strip()
 
-        if "stock" in data:
+    if "images" in data:
+        images_list = data.get("images") or []
+        if isinstance(images_list, str):
             try:
-                stock = int(data.get("stock"))
+                import json
+                images_list = json.loads(images_list)
             except Exception:
-                return jsonify({"error": "El campo 'stock' debe ser numérico"}), 400
-            set_field("stock", stock)
+                images_list = [images_list] if images_list else []
+        elif not isinstance(images_list, list):
+            images_list = []
+        updates["images"] = Json(images_list)
 
-        if "image" in data:
-            set_field("image", (data.get("image") or "").strip())
+    if "status" in data:
+        updates["status"] = (data.get("status") or "").strip()
 
-        if "images" in data:
-            images_list = data.get("images") or []
-            if isinstance(images_list, str):
-                try:
-                    import json
-                    images_list = json.loads(images_list)
-                except Exception:
-                    images_list = [images_list] if images_list else []
-            elif not isinstance(images_list, list):
-                images_list = []
-            
-            import json
-            images_json = json.dumps(images_list)
-            set_field("images", images_json)
+    if "condition" in data:
+        updates["condition"] = (data.get("condition") or "").strip()
 
-        if "status" in data:
-            set_field("status", (data.get("status") or "").strip())
+    return updates
 
-        if "condition" in data:
-            set_field("condition", (data.get("condition") or "").strip())
 
-        if not fields:
+@app.route("/api/products/<int:pid>", methods=["PUT", "PATCH"])
+@require_admin
+def update_product(pid: int):
+    try:
+        data = request.get_json(force=True) or {}
+        print(f"DEBUG: Actualizando producto {pid} con datos: {data}")
+
+        try:
+            updates = parse_product_update(data)
+        except InvalidProductUpdate as e:
+            return jsonify({"error": str(e)}), 400
+
+        if not updates:
             return jsonify({"error": "Nada para actualizar"}), 400
 
+        fields = [f"{column} = %s" for column in updates]
+        params = list(updates.values())
         params.append(pid)
 
         conn = get_conn()
@@ -1604,24 +1841,17 @@ def update_product(pid: int):
             if cur.rowcount == 0:
                 return jsonify({"error": "Producto no encontrado"}), 404
             conn.commit()  # Confirmar la transacción
+            invalidate_catalog()
             
             print(f"DEBUG: Producto {pid} actualizado exitosamente")
             
             # Verificar si la columna porcentaje_descuento existe antes de hacer SELECT
             try:
-                cursor_check = conn.cursor()
-                cursor_check.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'productos' AND column_name = 'porcentaje_descuento'
-                """)
-                column_exists = cursor_check.fetchone() is not None
-                
-                if column_exists:
-                    query = "SELECT id, name, brand, price, COALESCE(porcentaje_descuento, NULL) as porcentaje_descuento, category, condition, sizes, stock, image, images, status, created_at, updated_at FROM productos WHERE id = %s"
+                if schema_registry.has_column('productos', 'porcentaje_descuento'):
+                    query = "SELECT id, name, brand, price, porcentaje_descuento, precio_efectivo, category, condition, sizes, stock, image, images, status, created_at, updated_at FROM productos WHERE id = %s"
                 else:
                     print("WARNING: Usando query sin porcentaje_descuento")
-                    query = "SELECT id, name, brand, price, NULL as porcentaje_descuento, category, condition, sizes, stock, image, images, status, created_at, updated_at FROM productos WHERE id = %s"
+                    query = "SELECT id, name, brand, price, NULL as porcentaje_descuento, precio_efectivo, category, condition, sizes, stock, image, images, status, created_at, updated_at FROM productos WHERE id = %s"
                 
                 row = execute_query(conn, query, (pid,)).fetchone()
                 print(f"DEBUG: Row obtenida: {row}")
@@ -1650,6 +1880,164 @@ def update_product(pid: int):
         return jsonify({"error": f"Error interno del servidor: {str(e)}"}), 500
 
 
+# Tipos para castear los VALUES del UPDATE masivo (psycopg2 manda todo como literal)
+PRODUCT_UPDATE_TYPES = {
+    "name": "varchar",
+    "brand": "varchar",
+    "price": "numeric",
+    "porcentaje_descuento": "numeric",
+    "category": "varchar",
+    "condition": "varchar",
+    "sizes": "text[]",
+    "stock": "integer",
+    "image": "text",
+    "images": "jsonb",
+    "status": "varchar",
+}
+BATCH_UPDATE_MAX_ITEMS = 1000
+
+
+@app.route("/api/admin/products", methods=["PATCH"])
+@require_admin
+def batch_update_products():
+    """
+    Actualización masiva: [{"id": 1, "price": 1000}, {"id": 2, "stock": 0}, ...]
+    Cada item se valida como en PUT /api/products/<id>; los válidos se aplican
+    en una sola transacción (un UPDATE ... FROM (VALUES ...) por combinación
+    de columnas) y el catálogo se invalida una sola vez.
+    Devuelve un resultado por item, en el orden recibido.
+    """
+    data = request.get_json(force=True, silent=True)
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list) or not data:
+        return jsonify({"error": "Se espera un arreglo de cambios con 'id'"}), 400
+    if len(data) > BATCH_UPDATE_MAX_ITEMS:
+        return jsonify({"error": f"Se pueden actualizar hasta {BATCH_UPDATE_MAX_ITEMS} productos por vez"}), 400
+
+    results = []
+    groups = {}  # columnas -> [(id, {columna: valor})]
+    seen = set()
+    for item in data:
+        result = {"id": item.get("id") if isinstance(item, dict) else None}
+        results.append(result)
+        try:
+            if not isinstance(item, dict):
+                raise InvalidProductUpdate("Cada cambio debe ser un objeto")
+            try:
+                pid = int(item.get("id"))
+            except (TypeError, ValueError):
+                raise InvalidProductUpdate("El campo 'id' es obligatorio y numérico")
+            if pid in seen:
+                raise InvalidProductUpdate("Producto repetido en el lote")
+            # Aunque el cambio sea inválido: otro item con el mismo id es un repetido
+            seen.add(pid)
+            updates = parse_product_update({k: v for k, v in item.items() if k != "id"})
+            if not updates:
+                raise InvalidProductUpdate("Nada para actualizar")
+        except InvalidProductUpdate as e:
+            result.update({"status": 400, "error": str(e)})
+            continue
+        result["id"] = pid
+        groups.setdefault(tuple(updates), []).append((pid, updates))
+
+    updated = set()
+    if groups:
+        conn = get_conn()
+        try:
+            cursor = conn.cursor()
+            for columns, items in groups.items():
+                assignments = ", ".join(f"{column} = v.{column}" for column in columns)
+                template = "(" + ", ".join(["%s::integer"] + [f"%s::{PRODUCT_UPDATE_TYPES[column]}" for column in columns]) + ")"
+                rows = execute_values(
+                    cursor,
+                    f"UPDATE productos p SET {assignments} "
+                    f"FROM (VALUES %s) AS v(id, {', '.join(columns)}) "
+                    "WHERE p.id = v.id RETURNING p.id",
+                    [(pid,) + tuple(updates[column] for column in columns) for pid, updates in items],
+                    template=template,
+                    page_size=len(items),
+                    fetch=True,
+                )
+                updated.update(row[0] for row in rows)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"ERROR en batch_update_products: {e}")
+            return jsonify({"error": f"Error interno del servidor: {str(e)}"}), 500
+        finally:
+            conn.close()
+
+    products = {}
+    if updated:
+        invalidate_catalog()
+        products = get_products_by_ids(updated)
+    for result in results:
+        if "error" in result:
+            continue
+        if result["id"] in updated:
+            result.update({"status": 200, "product": products.get(result["id"])})
+        else:
+            result.update({"status": 404, "error": "Producto no encontrado"})
+
+    return jsonify({
+        "updated": len(updated),
+        "failed": len(results) - len(updated),
+        "results": results,
+    }), 200
+
+
+def import_format(upload):
+    """?format=, o según el nombre / Content-Type del archivo (CSV por defecto)"""
+    fmt = request.args.get("format", "").strip().lower()
+    if fmt:
+        return fmt
+    filename = ((upload.filename if upload else "") or "").lower()
+    mimetype = (upload.mimetype if upload else request.mimetype) or ""
+    if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in mimetype or "jsonl" in mimetype:
+        return "ndjson"
+    return "csv"
+
+
+@app.route("/api/admin/products/import", methods=["POST"])
+@require_admin
+def import_products_bulk():
+    """
+    Importación masiva de productos: CSV con encabezado o NDJSON (un objeto por
+    línea), en el cuerpo o como archivo 'file'. Columnas: name (obligatoria),
+    brand, price, porcentaje_descuento, category, condition, sizes, stock,
+    image, images, status. Se actualiza el producto con el mismo nombre o se crea.
+    """
+    upload = request.files.get("file")
+    fmt = import_format(upload)
+    if fmt not in FORMATS:
+        return jsonify({"error": f"Formato no soportado: {fmt}"}), 400
+    try:
+        stream = codecs.getreader("utf-8-sig")(upload.stream if upload else request.stream)
+        report = import_products(read_records(stream, fmt))
+        return jsonify(report), 200
+    except (InvalidImport, UnicodeDecodeError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"ERROR in import_products_bulk: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/admin/products/export", methods=["GET"])
+@require_admin
+def export_products_bulk():
+    """Catálogo completo en CSV (mismas columnas que acepta la importación)"""
+    try:
+        chunks = export_products()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    filename = f"productos-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv"
+    response = app.response_class(chunks, mimetype="text/csv")
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    response.headers["Cache-Control"] = "private, no-store"
+    return response
+
+
 @app.route("/api/products/<int:pid>", methods=["DELETE"])
 @require_admin
 def delete_product(pid: int):
@@ -1659,6 +2047,7 @@ def delete_product(pid: int):
         if cur.rowcount == 0:
             return jsonify({"error": "Producto no encontrado"}), 404
         conn.commit()  # Confirmar la transacción
+        invalidate_catalog()
         return jsonify({"ok": True}), 200
     finally:
         conn.close()
@@ -1667,13 +2056,18 @@ def delete_product(pid: int):
 @app.route("/api/products/<int:pid>/images", methods=["GET"])
 def get_product_images(pid: int):
     """Obtener todas las imágenes de un producto"""
+    return catalog_conditional_response(pid, lambda: load_product_images(pid))
+
+
+def load_product_images(pid):
+    """Imagen principal más las adicionales de un producto"""
     conn = get_conn()
     try:
         row = execute_query(conn, "SELECT image, images FROM productos WHERE id = %s", (pid,)).fetchone()
         if not row:
             return jsonify({"error": "Producto no encontrado"}), 404
         
-        product_dict = row_to_dict(row)
+        product_dict = row_to_dict(row, columns=["image", "images"])
         all_images = [product_dict["image"]] + product_dict["images"]
         # Filtrar imágenes vacías
         all_images = [img for img in all_images if img and img.strip()]
@@ -1747,33 +2141,23 @@ def add_product_images(pid: int):
         # Actualizar el producto con las nuevas imágenes
         conn = get_conn()
         try:
-            row = execute_query(conn, "SELECT images FROM productos WHERE id = %s", (pid,)).fetchone()
+            # Append atómico sobre el jsonb: sin leer antes ni pisar subidas concurrentes
+            row = execute_query(
+                conn,
+                "UPDATE productos SET images = COALESCE(images, '[]'::jsonb) || %s WHERE id = %s RETURNING jsonb_array_length(images)",
+                (Json(uploaded_urls), pid)
+            ).fetchone()
             if not row:
                 return jsonify({"error": "Producto no encontrado"}), 404
-            
-            # Obtener imágenes existentes
-            existing_images = []
-            if row[0]:
-                try:
-                    import json
-                    existing_images = json.loads(row[0])
-                except Exception:
-                    existing_images = []
-            
-            # Agregar nuevas imágenes
-            all_images = existing_images + uploaded_urls
-            
-            # Actualizar en la base de datos
-            import json
-            images_json = json.dumps(all_images)
-            execute_query(conn, "UPDATE productos SET images = %s WHERE id = %s", (images_json, pid))
+            total_images = row[0]
             conn.commit()
+            invalidate_catalog()
             
             return jsonify({
                 "success": True,
                 "message": f"{len(uploaded_urls)} imágenes agregadas correctamente",
                 "uploaded_urls": uploaded_urls,
-                "total_images": len(all_images)
+                "total_images": total_images
             }), 200
         finally:
             conn.close()
@@ -1809,30 +2193,9 @@ def seed():
             "status": "Activo",
         },
     ]
-    conn = get_conn()
-    try:
-        for p in sample:
-            execute_query(conn,
-                """
-                INSERT INTO productos (name, brand, price, category, sizes, stock, image, images, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    p["name"],
-                    p["brand"],
-                    float(p["price"]),
-                    p["category"],
-                    ",".join(p["sizes"]),
-                    p["stock"],
-                    p["image"],
-                    "[]",  # images como JSON vacío
-                    p["status"],
-                ),
-            )
-        conn.commit()
-        return jsonify({"ok": True, "inserted": len(sample)}), 201
-    finally:
-        conn.close()
+    # Misma carga masiva que /api/admin/products/import (por nombre: no duplica)
+    report = import_products(enumerate(sample, 1))
+    return jsonify({"ok": True, "inserted": report["inserted"], "updated": report["updated"]}), 201
 
 # Esta ruta está duplicada y se elimina para evitar conflictos
 # La ruta correcta es /api/auth/login
@@ -2093,35 +2456,6 @@ def auth_register():
         print(f"   Error: {result.get('error')}")
         
         if result['success']:
-            # Crear tabla de verificación de email si no existe
-            conn = get_conn()
-            try:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS email_verification_tokens (
-                        id SERIAL PRIMARY KEY,
-                        user_id INTEGER NOT NULL,
-                        token TEXT NOT NULL UNIQUE,
-                        email TEXT NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        expires_at TIMESTAMP NOT NULL,
-                        used BOOLEAN DEFAULT FALSE,
-                        FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-                    )
-                ''')
-                
-                # Agregar columna email_verified si no existe
-                try:
-                    cursor.execute('ALTER TABLE users ADD COLUMN email_verified BOOLEAN DEFAULT FALSE')
-                except:
-                    pass  # La columna ya existe
-                
-                conn.commit()
-            except Exception as e:
-                print(f"Error creando tabla de verificación: {e}")
-            finally:
-                conn.close()
-            
             # Enviar email de verificación si está disponible
             if EMAIL_AVAILABLE and profile_data.get('email'):
                 try:
@@ -2182,6 +2516,8 @@ def auth_register():
         else:
             return jsonify(result), 400
             
+    except PasswordHashingBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -2231,6 +2567,8 @@ def auth_login():
         
         return jsonify(result), status_code
         
+    except PasswordHashingBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         print(f"DEBUG: Error en auth_login: {str(e)}")
         import traceback
@@ -2337,17 +2675,56 @@ def update_profile():
 @app.route("/api/admin/products", methods=["GET"])
 @require_admin
 def list_products_admin():
-    """Ruta para administradores - lista todos los productos sin filtros"""
+    """
+    Ruta para administradores - lista todos los productos sin filtros (paginado igual que /api/products).
+    Con Accept: application/x-ndjson se envía la tabla completa, un producto por línea en streaming.
+    """
     try:
-        conn = get_conn()
-        try:
-            rows = execute_query(conn, "SELECT id, name, brand, price, COALESCE(porcentaje_descuento, NULL) as porcentaje_descuento, category, condition, sizes, stock, image, images, status, created_at, updated_at FROM productos ORDER BY id DESC").fetchall()
-            return jsonify([row_to_dict(r) for r in rows]), 200
-        finally:
-            conn.close()
+        if wants_ndjson():
+            columns = tuple(product_columns(None))
+            query = f"SELECT {', '.join(columns)} FROM productos ORDER BY id DESC"
+            return ndjson_response(query, (), compile_product_serializer(columns))
+
+        page = parse_page(request.args)
+        return catalog_conditional_response(
+            page,
+            lambda: (jsonify(load_products(NO_PRODUCT_FILTERS, page)), 200),
+            private=True
+        )
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ---------------------- MÉTRICAS ----------------------
+
+@app.route("/api/admin/metrics", methods=["GET"])
+@require_admin
+def get_metrics():
+    """Contadores internos del proceso (solo admin)"""
+    from database import get_pool_stats
+    from catalog_cache import get_catalog_stats
+    from change_feed import change_feed
+    from bulk_products import get_bulk_stats
+    from ndjson_stream import get_stream_stats
+    from session_cache import get_session_cache_stats
+    from maintenance import maintenance
+    from session_tokens import session_revocations
+    from password_hashing import password_hasher
+    return jsonify({
+        "db_pool": get_pool_stats(),
+        "catalog_cache": get_catalog_stats(),
+        "change_feed": change_feed.stats(),
+        "bulk_products": get_bulk_stats(),
+        "catalog_snapshot": catalog_snapshot.stats(),
+        "ndjson_streams": get_stream_stats(),
+        "session_cache": get_session_cache_stats(),
+        "maintenance": maintenance.stats(),
+        "session_tokens": session_revocations.stats(),
+        "password_hashing": password_hasher.stats(),
+        "rate_limit": rate_limiter.stats(),
+    }), 200
+
 # ---------------------- RUTAS DE DEBUG ----------------------
 
 @app.route("/api/debug/sessions", methods=["GET"])
@@ -2810,17 +3187,18 @@ def create_transfer_order_direct(items, customer_info, total_amount):
                 print("ERROR - No se pudo obtener el order_id")
                 raise Exception("No se pudo obtener el ID del pedido")
             
+            # Stock de todos los productos, bloqueados hasta el commit
+            products = get_products_by_ids(
+                [item['product_id'] for item in items], columns=('id', 'stock'),
+                cursor=cursor, for_update=True,
+            )
+            
             # Insertar items del pedido
             for item in items:
                 print(f"DEBUG - Insertando item: {item}")
                 
-                # Obtener stock actual del producto
-                cursor.execute(
-                    "SELECT stock FROM productos WHERE id = %s",
-                    (item['product_id'],)
-                )
-                product = cursor.fetchone()
-                current_stock = int(product['stock']) if product else 0
+                product = products.get(int(item['product_id']))
+                current_stock = product['stock'] if product else 0
                 
                 # Verificar stock disponible
                 if current_stock < item['quantity']:
@@ -2832,6 +3210,8 @@ def create_transfer_order_direct(items, customer_info, total_amount):
                     "UPDATE productos SET stock = %s WHERE id = %s",
                     (new_stock, item['product_id'])
                 )
+                if product:
+                    product['stock'] = new_stock  # el mismo producto puede repetirse en el carrito
                 
                 cursor.execute(
                     """
@@ -2842,6 +3222,7 @@ def create_transfer_order_direct(items, customer_info, total_amount):
                 )
             
             conn.commit()
+            invalidate_catalog()  # Cambió el stock
             print(f"DEBUG - Pedido guardado exitosamente con ID: {order_id}")
             
             # Enviar email de confirmación si está disponible
@@ -3065,65 +3446,69 @@ def get_user_orders():
 
 # ---------------------- GESTIÓN DE PEDIDOS (ADMIN) ----------------------
 
+# Pedidos con sus items (json_agg) en una sola consulta; cada fila es un pedido completo
+ORDERS_LIST_SQL = """
+    SELECT o.id, o.order_number, o.customer_name, o.customer_email,
+           o.customer_phone, o.total_amount, o.payment_method, o.status,
+           o.created_at, o.updated_at, o.customer_address, o.customer_city, o.customer_zip,
+           o.verification_code, COALESCE(i.items, '[]'::json)
+    FROM orders o
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object(
+                   'product_id', oi.product_id, 'quantity', oi.quantity, 'price', oi.price,
+                   'name', p.name, 'brand', p.brand
+               ) ORDER BY oi.id) AS items
+        FROM order_items oi
+        LEFT JOIN productos p ON oi.product_id = p.id
+        WHERE oi.order_id = o.id
+    ) i ON TRUE
+    ORDER BY o.created_at DESC
+"""
+
+
+def order_summary(order):
+    """Fila de ORDERS_LIST_SQL -> dict para el admin"""
+    return {
+        'id': order[0],
+        'order_number': order[1],
+        'customer_name': order[2],
+        'customer_email': order[3],
+        'customer_phone': order[4],
+        'total_amount': float(order[5]),
+        'payment_method': order[6],
+        'status': order[7],
+        'created_at': order[8].isoformat() if order[8] else None,
+        'updated_at': order[9].isoformat() if order[9] else None,
+        'customer_address': order[10],
+        'customer_city': order[11],
+        'customer_zip': order[12],
+        'verification_code': order[13],
+        'items': [
+            {
+                'product_id': item['product_id'],
+                'quantity': item['quantity'],
+                'price': float(item['price']),
+                'name': item['name'] or 'Producto eliminado',
+                'brand': item['brand'] or 'N/A'
+            }
+            for item in order[14]
+        ]
+    }
+
+
 @app.route("/api/admin/orders", methods=["GET"])
 @require_admin
 def get_all_orders():
-    """Obtener todos los pedidos (solo admin)"""
+    """Obtener todos los pedidos (solo admin); con Accept: application/x-ndjson, uno por línea en streaming"""
     try:
+        if wants_ndjson():
+            return ndjson_response(ORDERS_LIST_SQL, (), order_summary)
+
         conn = get_conn()
         try:
-            # Obtener pedidos con información básica
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT o.id, o.order_number, o.customer_name, o.customer_email, 
-                       o.customer_phone, o.total_amount, o.payment_method, o.status,
-                       o.created_at, o.updated_at, o.customer_address, o.customer_city, o.customer_zip,
-                       o.verification_code
-                FROM orders o
-                ORDER BY o.created_at DESC
-            """)
-            
-            orders = cursor.fetchall()
-            
-            result = []
-            for order in orders:
-                # Obtener items de cada pedido
-                cursor.execute("""
-                    SELECT oi.product_id, oi.quantity, oi.price, p.name, p.brand
-                    FROM order_items oi
-                    LEFT JOIN productos p ON oi.product_id = p.id
-                    WHERE oi.order_id = %s
-                """, (order[0],))
-                
-                items = cursor.fetchall()
-                
-                result.append({
-                    'id': order[0],
-                    'order_number': order[1],
-                    'customer_name': order[2],
-                    'customer_email': order[3],
-                    'customer_phone': order[4],
-                    'total_amount': float(order[5]),
-                    'payment_method': order[6],
-                    'status': order[7],
-                    'created_at': order[8].isoformat() if order[8] else None,
-                    'updated_at': order[9].isoformat() if order[9] else None,
-                    'customer_address': order[10],
-                    'customer_city': order[11],
-                    'customer_zip': order[12],
-                    'verification_code': order[13],
-                    'items': [
-                        {
-                            'product_id': item[0],
-                            'quantity': item[1],
-                            'price': float(item[2]),
-                            'name': item[3] or 'Producto eliminado',
-                            'brand': item[4] or 'N/A'
-                        }
-                        for item in items
-                    ]
-                })
-            
+            cursor.execute(ORDERS_LIST_SQL)
+            result = [order_summary(order) for order in cursor.fetchall()]
             return jsonify({"success": True, "orders": result}), 200
             
         finally:
@@ -3285,8 +3670,11 @@ def delete_order(order_id):
 @app.route("/api/admin/users", methods=["GET"])
 @require_admin
 def get_all_users():
-    """Obtener todos los usuarios (solo admin)"""
+    """Obtener todos los usuarios (solo admin); con Accept: application/x-ndjson, uno por línea en streaming"""
     try:
+        if wants_ndjson():
+            return ndjson_response(USER_LIST_SQL, (), user_summary, cursor_factory=RealDictCursor)
+
         print(f"DEBUG: Obteniendo lista de usuarios para admin")
         users = auth_manager.get_all_users()
         print(f"DEBUG: Usuarios obtenidos: {len(users)} usuarios")
@@ -3404,6 +3792,8 @@ def create_user_admin():
             return jsonify(result), 201
         else:
             return jsonify(result), 400
+    except PasswordHashingBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
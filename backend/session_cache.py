@@ -0,0 +1,100 @@
+"""
+Caché de sesiones validadas (AuthManager.validate_session).
+
+Las entradas se indexan por el sha256 del token (el token en sí no queda en
+memoria) y guardan el usuario de la sesión junto con su vencimiento. Un
+acierto no va a la base. Duran a lo sumo SESSION_CACHE_TTL segundos y nunca
+más allá del vencimiento de la sesión.
+
+Con tokens firmados se cachean además los datos de cada usuario (clave
+user:<id>), que el token no lleva. Se invalidan al cerrar sesión y al cambiar
+o borrar el usuario. Las
+escrituras de otros procesos sobre sessions y users llegan por el feed de
+cambios (change_feed.py).
+"""
+import hashlib
+import time
+from cache import LRUCache
+from change_feed import change_feed
+from config import SESSION_CACHE_MAX_ENTRIES, SESSION_CACHE_TTL
+
+session_cache = LRUCache('sessions', max_size=SESSION_CACHE_MAX_ENTRIES, ttl=SESSION_CACHE_TTL)
+
+
+def token_key(token):
+    """Clave de caché de un token"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def get_cached_session(token):
+    """Usuario de la sesión si está en caché y vigente (None si hay que consultar la base)"""
+    if not SESSION_CACHE_TTL:
+        return None
+    key = token_key(token)
+    entry = session_cache.get(key)
+    if entry is None:
+        return None
+    user, expires_at = entry
+    if expires_at <= time.time():
+        session_cache.delete(key)
+        return None
+    return dict(user)
+
+
+def cache_session(token, user, expires_at, generation):
+    """Guarda una sesión validada (`expires_at`: epoch; `generation`: tomada antes de consultar)"""
+    if not SESSION_CACHE_TTL:
+        return
+    session_cache.set(token_key(token), (dict(user), expires_at), generation=generation)
+
+
+def get_cached_profile(user_id, load):
+    """
+    Datos del usuario (username, nombre, apellido, email) para los tokens
+    firmados: de la caché, o `load(user_id)` (None si el usuario no existe).
+    Se descartan junto con las sesiones del usuario cuando este cambia.
+    """
+    key = f"user:{user_id}"
+    entry = session_cache.get(key) if SESSION_CACHE_TTL else None
+    if entry is not None:
+        return dict(entry[0])
+    generation = session_cache.generation
+    profile = load(user_id)
+    if profile is not None and SESSION_CACHE_TTL:
+        session_cache.set(key, (dict(profile), None), generation=generation)
+    return profile
+
+
+def invalidate_session(token):
+    """Descarta la sesión de un token (logout, renovación)"""
+    session_cache.invalidate(token_key(token))
+
+
+def invalidate_user_sessions(user_id):
+    """Descarta todas las sesiones cacheadas de un usuario (cambio de rol, datos o baja)"""
+    session_cache.discard(lambda _, entry: entry[0]['user_id'] == user_id)
+
+
+def _on_session_change(event):
+    """Sesión escrita en otro proceso: el aviso trae el usuario, no el token"""
+    if event.get('op') == 'RESYNC':
+        session_cache.clear()
+    elif event.get('op') != 'INSERT':
+        invalidate_user_sessions(event.get('user_id'))
+
+
+def _on_user_change(event):
+    """Usuario modificado o borrado: sus datos cacheados (rol, nombre) quedan viejos"""
+    if event.get('op') == 'RESYNC':
+        session_cache.clear()
+    elif event.get('op') != 'INSERT':
+        invalidate_user_sessions(event.get('id'))
+
+
+change_feed.subscribe('sessions', _on_session_change)
+change_feed.subscribe('users', _on_user_change)
+
+
+def get_session_cache_stats():
+    """Contadores de la caché de sesiones (hit_ratio incluido)"""
+    return session_cache.stats()
@@ -0,0 +1,214 @@
+"""
+Tokens de sesión firmados (SESSION_TOKEN_MODE=signed).
+
+El token es un JWT HS256 firmado con JWT_SECRET_KEY. Sus claims son sid (id
+de la fila en sessions), uid, role, exp e iat. require_auth / require_admin
+lo verifican en memoria; el resto de los datos del usuario (nombre, email)
+sale de la caché de sesiones, que se descarta cuando el usuario cambia.
+
+La fila en sessions se sigue creando y es la fuente de verdad: cerrar sesión,
+cambiar el rol o borrar el usuario borra las filas. Cada proceso mantiene un
+conjunto de revocación compacto:
+- una foto de los ids de sesión vigentes (y el id máximo al tomarla),
+  releída de sessions cada SESSION_REVOCATION_SYNC_INTERVAL segundos;
+- los ids borrados desde la última foto, que llegan por el feed de cambios.
+Un sid borrado después de la foto está revocado; uno posterior a la foto vale
+hasta que llegue su borrado. Si es anterior a la foto y no estaba entre las
+vigentes (revocada, o su INSERT aún no estaba confirmado al leer) se
+consulta una vez la fila y el resultado queda guardado hasta la próxima foto.
+
+El modo por defecto sigue siendo el token opaco (SESSION_TOKEN_MODE=opaque).
+Sin una JWT_SECRET_KEY (o SECRET_KEY) propia no se firman ni se aceptan
+tokens: con la clave por defecto cualquiera podría armar uno de admin, así
+que el modo signed cae a tokens opacos.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from database import get_pool
+from change_feed import change_feed
+from config import JWT_SECRET_KEY, DEFAULT_SECRET_KEY, SESSION_TOKEN_MODE, SESSION_REVOCATION_SYNC_INTERVAL
+
+# La clave por defecto es pública (está en el código): no sirve para firmar
+SIGNING_KEY_CONFIGURED = bool(JWT_SECRET_KEY) and JWT_SECRET_KEY != DEFAULT_SECRET_KEY
+
+SIGNED_TOKENS = SESSION_TOKEN_MODE == 'signed' and SIGNING_KEY_CONFIGURED
+if SESSION_TOKEN_MODE == 'signed' and not SIGNED_TOKENS:
+    print("❌ SESSION_TOKEN_MODE=signed sin JWT_SECRET_KEY propia: se usan tokens opacos")
+
+_HEADER = {'alg': 'HS256', 'typ': 'JWT'}
+
+
+class InvalidToken(ValueError):
+    """Token firmado mal formado, con firma inválida o vencido"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(signing_input):
+    if not SIGNING_KEY_CONFIGURED:
+        raise InvalidToken("Sin clave de firma configurada")
+    return hmac.new(JWT_SECRET_KEY.encode('utf-8'), signing_input, hashlib.sha256).digest()
+
+
+def is_signed_token(token):
+    """True si el token tiene forma de JWT (header.payload.firma)"""
+    return token.count('.') == 2
+
+
+def encode_token(claims):
+    """JWT HS256 de `claims` (InvalidToken si no hay clave de firma propia)"""
+    header = _b64encode(json.dumps(_HEADER, separators=(',', ':')).encode('utf-8'))
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    signing_input = f"{header}.{payload}".encode('ascii')
+    return f"{header}.{payload}.{_b64encode(_sign(signing_input))}"
+
+
+def decode_token(token, verify_exp=True):
+    """Claims de un JWT HS256 propio; InvalidToken si no verifica"""
+    try:
+        header, payload, signature = token.split('.')
+        signing_input = f"{header}.{payload}".encode('ascii')
+        if not hmac.compare_digest(_sign(signing_input), _b64decode(signature)):
+            raise InvalidToken("Firma inválida")
+        if json.loads(_b64decode(header)).get('alg') != 'HS256':
+            raise InvalidToken("Algoritmo no soportado")
+        claims = json.loads(_b64decode(payload))
+    except InvalidToken:
+        raise
+    except Exception:
+        raise InvalidToken("Token mal formado")
+    if verify_exp and claims.get('exp', 0) <= time.time():
+        raise InvalidToken("Token vencido")
+    return claims
+
+
+class SessionRevocations:
+    """Conjunto de sesiones revocadas, sincronizado con la tabla sessions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._live = frozenset()  # ids vigentes en la última foto
+        self._max_id = 0  # id máximo al tomar la foto (los posteriores no se conocen)
+        self._revoked = {}  # id -> instante en que se supo del borrado (desde la foto)
+        self._confirmed = set()  # anteriores a la foto que no estaban en ella pero existen
+        self._synced_at = None
+        self._thread = None
+        self._pid = None
+        self._counters = {
+            'syncs': 0,
+            'sync_errors': 0,
+            'revoked_checks': 0,
+            'lookups': 0,
+        }
+
+    def start(self):
+        """Sincroniza ahora y arranca el hilo de resincronización (solo en modo signed)"""
+        if not SIGNED_TOKENS:
+            return False
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return True
+            self._pid = os.getpid()
+        self.sync()
+        with self._lock:
+            self._thread = threading.Thread(target=self._run, name='session-revocations', daemon=True)
+            self._thread.start()
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(SESSION_REVOCATION_SYNC_INTERVAL)
+            try:
+                self.sync()
+            except Exception as e:
+                self._counters['sync_errors'] += 1
+                print(f"❌ Error sincronizando sesiones revocadas: {e}")
+
+    def sync(self):
+        """Foto de las sesiones vigentes; reemplaza lo acumulado por el feed"""
+        started = time.monotonic()
+        with get_pool().connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM sessions WHERE expires_at > NOW()")
+            live = frozenset(row[0] for row in cursor.fetchall())
+            # Último id entregado por la secuencia (MAX(id) no ve las filas ya borradas)
+            cursor.execute("SELECT last_value FROM sessions_id_seq")
+            max_id = cursor.fetchone()[0]
+            conn.rollback()
+        with self._lock:
+            # Los borrados avisados mientras se leía pueden no estar en la foto: se conservan
+            self._live, self._max_id = live, max_id
+            self._revoked = {sid: at for sid, at in self._revoked.items() if sid > max_id or at >= started}
+            self._confirmed = set()
+            self._synced_at = time.time()
+            self._counters['syncs'] += 1
+
+    def revoke(self, session_id):
+        with self._lock:
+            self._revoked[session_id] = time.monotonic()
+            self._confirmed.discard(session_id)
+
+    def is_revoked(self, session_id):
+        with self._lock:
+            self._counters['revoked_checks'] += 1
+            if session_id in self._revoked:
+                return True
+            if session_id > self._max_id or session_id in self._live or session_id in self._confirmed:
+                return False
+            self._counters['lookups'] += 1
+
+        exists = self._session_exists(session_id)
+        with self._lock:
+            if exists:
+                self._confirmed.add(session_id)
+            else:
+                self._revoked[session_id] = time.monotonic()
+        return not exists
+
+    @staticmethod
+    def _session_exists(session_id):
+        with get_pool().connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM sessions WHERE id = %s AND expires_at > NOW()", (session_id,))
+            exists = cursor.fetchone() is not None
+            conn.rollback()
+        return exists
+
+    def _on_session_change(self, event):
+        if event.get('op') == 'RESYNC':
+            try:
+                self.sync()
+            except Exception as e:
+                self._counters['sync_errors'] += 1
+                print(f"❌ Error sincronizando sesiones revocadas: {e}")
+        elif event.get('op') == 'DELETE' and event.get('id') is not None:
+            self.revoke(event['id'])
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._counters)
+            data.update({
+                'mode': 'signed' if SIGNED_TOKENS else 'opaque',
+                'live': len(self._live),
+                'revoked_since_sync': len(self._revoked),
+                'confirmed_since_sync': len(self._confirmed),
+                'synced_at': self._synced_at,
+            })
+        return data
+
+
+# Instancia global
+session_revocations = SessionRevocations()
+if SIGNED_TOKENS:
+    change_feed.subscribe('sessions', session_revocations._on_session_change)